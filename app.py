@@ -1,655 +1,504 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-from io import BytesIO
-import re
-
-# Page configuration
-st.set_page_config(
-    page_title="Bazaar Peer Review Grader",
-    page_icon="📊",
-    layout="wide"
+from io import BytesIO, StringIO
+import importlib
+import inspect
+import logging
+import math
+import os
+import time
+
+from grader_config import (
+    CACHE_DIR,
+    CACHE_MAX_MB,
+    RED_FLAG_KEYWORDS,
+    THUMBNAIL_CACHE_MAX_MB,
+    THUMBNAIL_PROXY,
+    VARIANCE_THRESHOLD_DEFAULT,
+    VARIANCE_THRESHOLD_MAX,
+    VARIANCE_THRESHOLD_MIN,
+    VARIANCE_THRESHOLDS,
 )
 
-# Helper Functions
-def extract_group_id(student_name):
-    """Extract group ID from student name (e.g., '2A - Watts, BriAri' -> '2A')"""
-    if pd.isna(student_name) or student_name == "":
-        return None
-    match = re.match(r'^([^-]+)', str(student_name).strip())
-    return match.group(1).strip() if match else None
+logger = logging.getLogger(__name__)
+
+# Data Stack
+# pandas, NumPy and grader_core (which pulls in both) take longer to import
+# than Streamlit itself, so they load on first use instead of at startup. The
+# landing page renders without them.
+pd = None
+core = None
+
+DATA_STACK_MODULES = ['numpy', 'pandas', 'grader_core']
+
+# Time budget for loading the data stack on first use (seconds)
+DATA_STACK_BUDGET_SECONDS = float(os.environ.get('BAZAAR_DATA_STACK_BUDGET', '1.5'))
+
+@st.cache_resource(show_spinner=False)
+def _import_data_stack():
+    """Import the data stack once per process and return per-module import times"""
+    timings = {}
+    for name in DATA_STACK_MODULES:
+        start = time.perf_counter()
+        importlib.import_module(name)
+        timings[name] = time.perf_counter() - start
+
+    total = sum(timings.values())
+    detail = ", ".join(f"{name}={seconds:.3f}s" for name, seconds in timings.items())
+    if total > DATA_STACK_BUDGET_SECONDS:
+        logger.warning("Data stack loaded in %.3fs, over the %.2fs budget (%s)", total, DATA_STACK_BUDGET_SECONDS, detail)
+    else:
+        logger.info("Data stack loaded in %.3fs (%s)", total, detail)
+    return timings
 
-def parse_peer_review_data(df):
+def load_data_stack():
     """
-    Transform wide-format peer review data into structured format.
-    Returns a dict of groups with student evaluations.
-    Only keeps the most recent submission per student (in case of duplicates).
+    Make pd and core available to the rest of the app, importing them on
+    the first call. Returns {module: import seconds} from the first load.
     """
-    # First, deduplicate: keep only the most recent submission per student
-    df_sorted = df.sort_values('Timestamp', ascending=False)
-    df_deduped = df_sorted.drop_duplicates(subset=['YOU - Group Member 1'], keep='first')
-
-    groups = {}
-
-    for idx, row in df_deduped.iterrows():
-        # Extract submitter info
-        submitter_name = row.get('YOU - Group Member 1', '')
-        group_id = extract_group_id(submitter_name)
-
-        if not group_id:
-            continue
-
-        if group_id not in groups:
-            groups[group_id] = {
-                'students': set(),
-                'evaluations': [],
-                'feedback': []
-            }
-
-        # Add submitter to students set
-        groups[group_id]['students'].add(submitter_name)
-
-        # Parse evaluations for all team members
-        evaluation = {
-            'submitter': submitter_name,
-            'timestamp': row.get('Timestamp', ''),
-            'percentages': {},
-            'work_descriptions': {},
-            'evidence_urls': [],
-            'photo_urls': []
-        }
-
-        # Member 1 (submitter/self)
-        member1_pct = row.get('Your percentage of work / effort', 0)
-        evaluation['percentages'][submitter_name] = parse_percentage(member1_pct)
-        evaluation['work_descriptions'][submitter_name] = {
-            'design': row.get('Please explain what you did regarding DESIGN work on the project. ', ''),
-            'manufacturing': row.get('Please explain what you did regarding MANUFACTURING work on the project. ', ''),
-            'sales': row.get('Please explain what you did regarding SALES / MANAGEMENT work on the project. ', ''),
-            'marketing': row.get('Please explain what you did regarding MARKETING / ADVERTISING work on the project. ', '')
-        }
-
-        # Member 2
-        member2_name = row.get('Group Member 2', '')
-        if member2_name and not pd.isna(member2_name):
-            groups[group_id]['students'].add(member2_name)
-            member2_pct = row.get('Group Member 2 percentage of work / effort', 0)
-            evaluation['percentages'][member2_name] = parse_percentage(member2_pct)
-            evaluation['work_descriptions'][member2_name] = {
-                'design': row.get('Please explain what Group Member 2 did regarding DESIGN work on the project. ', ''),
-                'manufacturing': row.get('Please explain what Group Member 2 did regarding MANUFACTURING work on the project. ', ''),
-                'sales': row.get('Please explain what Group Member 2 did regarding SALES / MANAGEMENT work on the project. ', ''),
-                'marketing': row.get('Please explain what Group Member 2 did regarding MARKETING / ADVERTISING work on the project. ', '')
-            }
-
-        # Member 3
-        member3_name = row.get('Group Member 3', '')
-        if member3_name and not pd.isna(member3_name):
-            groups[group_id]['students'].add(member3_name)
-            member3_pct = row.get('Group Member 3 percentage of work / effort', 0)
-            evaluation['percentages'][member3_name] = parse_percentage(member3_pct)
-            evaluation['work_descriptions'][member3_name] = {
-                'design': row.get('Please explain what Group Member 3 did regarding DESIGN work on the project. ', ''),
-                'manufacturing': row.get('Please explain what Group Member 3 did regarding MANUFACTURING work on the project. ', ''),
-                'sales': row.get('Please explain what Group Member 3 did regarding SALES / MANAGEMENT work on the project. ', ''),
-                'marketing': row.get('Please explain what Group Member 3 did regarding MARKETING / ADVERTISING work on the project. ', '')
-            }
-
-        # Member 4 (conditional)
-        has_member4 = row.get('Did you have a 4th member of your group?', '')
-        if has_member4 and str(has_member4).lower() == 'yes':
-            member4_name = row.get('Group Member 4', '')
-            if member4_name and not pd.isna(member4_name):
-                groups[group_id]['students'].add(member4_name)
-                member4_pct = row.get('Group Member 4 percentage of work / effort', 0)
-                evaluation['percentages'][member4_name] = parse_percentage(member4_pct)
-                evaluation['work_descriptions'][member4_name] = {
-                    'design': row.get('Please explain what Group Member 4 did regarding DESIGN work on the project. ', ''),
-                    'manufacturing': row.get('Please explain what Group Member 4 did regarding MANUFACTURING work on the project. ', ''),
-                    'sales': row.get('Please explain what Group Member 4 did regarding SALES / MANAGEMENT work on the project. ', ''),
-                    'marketing': row.get('Please explain what Group Member 4 did regarding MARKETING / ADVERTISING work on the project. ', '')
-                }
-
-        # Collect evidence URLs (per student submission)
-        evidence_col = 'Evidence to include:\n- Evidence of effort or lack thereof\n- If you followed my advice and communicated over a group chat, Snap, GChat / etc, you can submit screenshots of your communications if needed (not required but can bolster a claim)\n- Include all files related to your work, especially Adobe Illustrator files.'
-        evidence_urls = row.get(evidence_col, '')
-        if evidence_urls and not pd.isna(evidence_urls):
-            evaluation['evidence_urls'] = parse_urls(evidence_urls)
-
-        # Collect photo URLs (per student submission)
-        photo_col = 'Photos of your items\n- Include clear photos of each item that you either made yourself or strongly contributed to, INCLUDING your mini sheet item and your advanced item(s)'
-        photo_urls = row.get(photo_col, '')
-        if photo_urls and not pd.isna(photo_urls):
-            evaluation['photo_urls'] = parse_urls(photo_urls)
-
-        groups[group_id]['evaluations'].append(evaluation)
-
-        # Collect feedback
-        feedback = {
-            'submitter': submitter_name,
-            'challenges': row.get('Challenges', ''),
-            'good_stuff': row.get('The Good Stuff', ''),
-            'advice': row.get('One (or more) pieces of solid advice', '')
-        }
-        groups[group_id]['feedback'].append(feedback)
-
-    return groups
-
-def parse_percentage(value):
-    """Convert percentage value to float"""
-    if pd.isna(value) or value == '':
-        return 0.0
+    global pd, core
+    timings = _import_data_stack()
+    import pandas as pd
+    import grader_core as core
+    return timings
+
+
+# Cached Ingest
+# Streamlit reruns main() on every widget interaction. Uploads are keyed on the
+# SHA-256 of their bytes so unchanged files skip CSV parsing and Excel decoding.
+# Entries beyond CACHE_MAX_ENTRIES are evicted least-recently-used first.
+CACHE_MAX_ENTRIES = 256
+
+# Default size of the process pool used to decode financial workbooks
+DEFAULT_INGEST_WORKERS = min(4, os.cpu_count() or 1)
+
+# Parsed uploads and analysis results are also kept in a DiskCache under
+# CACHE_DIR, so new sessions and restarted servers skip the work for files
+# they have seen before. st.cache_data stays in front of it for reruns.
+_DISK_MISS = object()
+
+@st.cache_resource
+def get_disk_cache():
+    """Process-wide persistent cache, or None when disabled or unavailable"""
+    if not CACHE_DIR:
+        return None
     try:
-        # Remove % sign if present
-        value_str = str(value).replace('%', '').strip()
-        return float(value_str)
-    except:
-        return 0.0
-
-def parse_urls(url_string):
-    """Extract URLs from comma-separated string"""
-    if pd.isna(url_string) or url_string == '':
-        return []
-    urls = [url.strip() for url in str(url_string).split(',')]
-    return [url for url in urls if url]
-
-def convert_gdrive_to_thumbnail(url):
-    """Convert Google Drive URL to thumbnail/viewable format"""
-    # Extract file ID from various Google Drive URL formats
-    import re
-
-    # Pattern 1: /open?id=FILE_ID
-    match = re.search(r'id=([a-zA-Z0-9_-]+)', url)
-    if match:
-        file_id = match.group(1)
-        return f"https://drive.google.com/thumbnail?id={file_id}&sz=w400"
-
-    # Pattern 2: /file/d/FILE_ID
-    match = re.search(r'/file/d/([a-zA-Z0-9_-]+)', url)
-    if match:
-        file_id = match.group(1)
-        return f"https://drive.google.com/thumbnail?id={file_id}&sz=w400"
-
-    # Return original if no match
-    return url
-
-def calculate_workload_variance(group_data):
-    """
-    Calculate workload variance for each student.
-    Returns dict of {student: variance_score}
-    """
-    students = list(group_data['students'])
-    evaluations = group_data['evaluations']
-
-    variance_scores = {}
+        return core.DiskCache(CACHE_DIR, int(CACHE_MAX_MB * 1024 * 1024))
+    except Exception as e:
+        logger.warning("Persistent cache disabled (%s): %s", CACHE_DIR, e)
+        return None
 
-    for student in students:
-        # Get all percentages assigned to this student
-        percentages = []
-        for eval in evaluations:
-            if student in eval['percentages']:
-                percentages.append(eval['percentages'][student])
-
-        if len(percentages) > 1:
-            # Calculate variance as max difference
-            variance = max(percentages) - min(percentages)
-            variance_scores[student] = variance
-        else:
-            variance_scores[student] = 0
+def disk_cached(key, compute):
+    """Return the persisted result for key, computing and storing it on a miss"""
+    disk = get_disk_cache()
+    if disk is None:
+        return compute()
+    value = disk.get(key, _DISK_MISS)
+    if value is _DISK_MISS:
+        value = compute()
+        disk.put(key, value)
+    return value
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _parse_peer_review_bytes(digest, _data):
+    return disk_cached(
+        ('groups', digest),
+        lambda: core.parse_peer_review_data(core.read_peer_review_csv(BytesIO(_data)))
+    )
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _parse_peer_review_exports(digests, _named_payloads, _workers):
+    return disk_cached(('groups', digests), lambda: core.parse_peer_review_exports(_named_payloads, _workers))
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _index_peer_review_uploads(digests, _named_payloads, keywords, _workers):
+    if len(digests) == 1:
+        groups = _parse_peer_review_bytes(digests[0], _named_payloads[0][1])
+    else:
+        groups = _parse_peer_review_exports(digests, _named_payloads, _workers)
+    return core.index_keyword_hits(groups, core.get_keyword_matcher(keywords))
 
-    return variance_scores
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _form_schema_bytes(digest, _data):
+    return core.resolve_form_schema(core.read_form_header(BytesIO(_data)))
 
-def check_percentage_sum(group_data):
-    """Check if percentages sum to 100 for each evaluation"""
-    issues = []
-    for eval in group_data['evaluations']:
-        total = sum(eval['percentages'].values())
-        if abs(total - 100) > 0.1:  # Allow small floating point errors
-            issues.append({
-                'submitter': eval['submitter'],
-                'total': total
-            })
-    return issues
-
-def detect_red_flag_keywords(text):
-    """Check for red flag keywords in feedback"""
-    if pd.isna(text) or text == '':
-        return []
-
-    red_flags = ['lazy', 'absent', 'rude', 'nothing', 'late', 'didn\'t', 'never', 'refused']
-    text_lower = str(text).lower()
-
-    found = []
-    for flag in red_flags:
-        if flag in text_lower:
-            found.append(flag)
-
-    return found
-
-def highlight_keywords(text):
-    """Highlight red flag keywords in text with red background"""
-    if pd.isna(text) or text == '':
-        return text
-
-    red_flags = ['lazy', 'absent', 'rude', 'nothing', 'late', 'didn\'t', 'never', 'refused']
-
-    highlighted_text = str(text)
-    for keyword in red_flags:
-        # Case-insensitive replacement with highlighted version (whole words only)
-        import re
-        pattern = re.compile(r'\b' + re.escape(keyword) + r'\b', re.IGNORECASE)
-        highlighted_text = pattern.sub(
-            f'<span style="background-color: #ffcccc; padding: 2px 4px; border-radius: 3px; font-weight: bold;">{keyword}</span>',
-            highlighted_text
-        )
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _load_roster_bytes(digest, _data):
+    return disk_cached(('roster', digest), lambda: core.load_roster(BytesIO(_data)))
 
-    return highlighted_text
-
-def check_low_sales(group_data, student_financials):
+def parse_peer_review_files_cached(peer_review_files, keywords=None, workers=1):
     """
-    Check if any student has significantly lower sales than groupmates.
-    Returns list of (student_name, income, avg_income) tuples for low performers.
+    Read and parse one or more peer review CSV uploads (e.g. one per period) into
+    a single groups dict, with the keyword span index for the given lexicon
+    attached, reusing the result for identical bytes and lexicon.
+    Several uploads are read and parsed across `workers` processes.
     """
-    if not student_financials:
-        return []
-
-    students = list(group_data['students'])
-
-    # Collect income data for all students in the group
-    incomes = []
-    student_income_map = {}
-
-    for student in students:
-        # Convert "GroupID - Last, First" to "First Last" for matching
-        student_short = student.split(' - ')[1] if ' - ' in student else student
+    keywords = tuple(keywords if keywords is not None else RED_FLAG_KEYWORDS)
+    digests = tuple(core.file_sha256(f) for f in peer_review_files)
+    named_payloads = [(f.name, f.getvalue()) for f in peer_review_files]
+    return _index_peer_review_uploads(digests, named_payloads, keywords, workers)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _analyze_groups(upload_key, keywords, _groups, _group_financials, _student_financials):
+    def analyze():
+        bases = {
+            group_id: core.analyze_group_base(
+                group_data,
+                _group_financials.get(group_id, None),
+                _student_financials.get(group_id, {}),
+                core.get_keyword_matcher(keywords)
+            )
+            for group_id, group_data in _groups.items()
+        }
+        return bases, core.sweep_group_flags(bases, VARIANCE_THRESHOLDS)
+    return disk_cached(('analysis', upload_key, keywords), analyze)
 
-        if ', ' in student_short:
-            parts = student_short.split(', ')
-            if len(parts) == 2:
-                excel_name = f"{parts[1]} {parts[0]}"
-            else:
-                excel_name = student_short
-        else:
-            excel_name = student_short
+def uploads_key(peer_review_files, financial_files):
+    """Cache key for a set of peer review and financial uploads: their digests (and financial filenames)"""
+    return (
+        tuple(core.file_sha256(f) for f in peer_review_files),
+        tuple((f.name, core.file_sha256(f)) for f in financial_files or [])
+    )
 
-        # Try to find this student in financials
-        if excel_name in student_financials:
-            income = student_financials[excel_name]['income']
-            incomes.append(income)
-            student_income_map[student_short] = income
-        else:
-            # Try partial match
-            for fin_name, fin_info in student_financials.items():
-                excel_parts = excel_name.split()
-                fin_parts = fin_name.split()
-                if excel_parts and fin_parts and excel_parts[-1].lower() == fin_parts[-1].lower():
-                    income = fin_info['income']
-                    incomes.append(income)
-                    student_income_map[student_short] = income
-                    break
-
-    if len(incomes) < 2:
-        # Need at least 2 students to compare
-        return []
-
-    # Calculate average income
-    avg_income = sum(incomes) / len(incomes)
-
-    # Flag students with income < 50% of average (and average is meaningful)
-    low_sellers = []
-    if avg_income > 10:  # Only flag if average is at least $10
-        for student_short, income in student_income_map.items():
-            if income < avg_income * 0.5:  # Less than 50% of average
-                low_sellers.append((student_short, income, avg_income))
-
-    return low_sellers
-
-def analyze_group_flags(group_data, financial_profit, variance_threshold, student_financials=None):
+def analyze_groups_cached(peer_review_files, financial_files, keywords, groups, group_financials, student_financials):
     """
-    Analyze group and return red flag status and reasons.
+    Run the threshold-independent checks for every group and sweep every slider
+    threshold once, reusing the result while the uploads and lexicon are unchanged.
+    Returns tuple: (bases, sweep)
     """
-    flags = []
-
-    # Check workload variance
-    variance_scores = calculate_workload_variance(group_data)
-    max_variance = max(variance_scores.values()) if variance_scores else 0
-
-    if max_variance > variance_threshold:
-        flags.append(f"High workload variance ({max_variance:.1f}%)")
-
-    # Check for students not pulling their weight (below fair share)
-    num_students = len(group_data['students'])
-    expected_pct = 100.0 / num_students
-    threshold_pct = expected_pct * 0.6  # Flag if below 60% of fair share
-
-    # Calculate average percentage assigned to each student
-    student_avg_pcts = {}
-    for student in group_data['students']:
-        percentages = []
-        for eval in group_data['evaluations']:
-            if student in eval['percentages']:
-                percentages.append(eval['percentages'][student])
-        if percentages:
-            student_avg_pcts[student] = sum(percentages) / len(percentages)
-
-    low_contributors = []
-    for student, avg_pct in student_avg_pcts.items():
-        if avg_pct < threshold_pct:
-            student_short = student.split(' - ')[1] if ' - ' in student else student
-            low_contributors.append((student_short, avg_pct, expected_pct))
-
-    if low_contributors:
-        for student_name, avg_pct, expected in low_contributors:
-            flags.append(f"Low workload: {student_name} ({avg_pct:.1f}% vs expected {expected:.1f}%)")
-
-    # Check financial profit
-    if financial_profit is not None and financial_profit < 0:
-        flags.append(f"Negative profit (${financial_profit:.2f})")
-
-    # Check for low sales compared to group (if we have student financial data)
-    if student_financials:
-        low_sellers = check_low_sales(group_data, student_financials)
-        if low_sellers:
-            for student_name, income, avg_income in low_sellers:
-                flags.append(f"Low sales: {student_name} (${income:.2f} vs avg ${avg_income:.2f})")
-
-    # Check for keyword red flags in feedback
-    keyword_flags = []
-    for feedback in group_data['feedback']:
-        for field in ['challenges', 'good_stuff', 'advice']:
-            keywords = detect_red_flag_keywords(feedback.get(field, ''))
-            if keywords:
-                keyword_flags.extend(keywords)
-
-    # Check in work descriptions
-    for eval in group_data['evaluations']:
-        for student, descriptions in eval['work_descriptions'].items():
-            for work_type, desc in descriptions.items():
-                keywords = detect_red_flag_keywords(desc)
-                if keywords:
-                    keyword_flags.extend(keywords)
-
-    if keyword_flags:
-        unique_keywords = list(set(keyword_flags))
-        flags.append(f"Red flag keywords: {', '.join(unique_keywords)}")
-
-    # Check percentage sum issues
-    pct_issues = check_percentage_sum(group_data)
-    if pct_issues:
-        flags.append(f"Percentage sum errors ({len(pct_issues)} submissions)")
-
-    is_red_flag = len(flags) > 0
-
-    return is_red_flag, flags, variance_scores
+    upload_key = uploads_key(peer_review_files, financial_files)
+    return _analyze_groups(upload_key, tuple(keywords), groups, group_financials, student_financials)
+
+def report_form_schema(peer_review_file, label=""):
+    """Show which form version the export matched, and any reworded or missing questions"""
+    schema = _form_schema_bytes(core.file_sha256(peer_review_file), peer_review_file.getvalue())
+    st.sidebar.caption(f"📝 {label}Form version: {schema['version']}")
+    if schema['fuzzy']:
+        st.sidebar.info(
+            f"{label}Matched reworded form questions:\n" +
+            "\n".join(f"- {name.splitlines()[0]}" for name in schema['fuzzy'].values())
+        )
+    if schema['missing']:
+        st.sidebar.warning(
+            f"{label}Form export has no column for:\n" +
+            "\n".join(f"- {column.strip().splitlines()[0]}" for column in schema['missing'])
+        )
 
-def load_roster(roster_file):
-    """
-    Load student roster from CSV.
-    Returns dict with group info and list of all students.
-    """
+def load_roster_cached(roster_file):
+    """Load a roster CSV upload, reusing the result for identical bytes"""
     if roster_file is None:
         return None
+    return _load_roster_bytes(core.file_sha256(roster_file), roster_file.getvalue())
 
-    df = pd.read_csv(roster_file)
-
-    roster = {
-        'students': [],
-        'groups': {},
-        'periods': {}
-    }
-
-    for idx, row in df.iterrows():
-        period = row['Period']
-        group = row['Group']
-        first_name = row['Student First Name']
-        last_name = row['Student Last Name']
-
-        # Format student name to match peer review format
-        student_name = f"{group} - {last_name}, {first_name}"
-
-        student_info = {
-            'name': student_name,
-            'first_name': first_name,
-            'last_name': last_name,
-            'group': group,
-            'period': period
-        }
-
-        roster['students'].append(student_info)
-
-        # Group by group ID
-        if group not in roster['groups']:
-            roster['groups'][group] = []
-        roster['groups'][group].append(student_info)
-
-        # Group by period
-        if period not in roster['periods']:
-            roster['periods'][period] = []
-        roster['periods'][period].append(student_info)
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _missing_submissions(upload_key, _roster, _groups):
+    def find():
+        missing = core.get_missing_submissions(_roster, _groups)
+        return missing, core.missing_by_period(missing)
+    return disk_cached(('missing', upload_key), find)
 
-    return roster
-
-def get_missing_submissions(roster, groups):
+def missing_submissions_cached(roster_file, peer_review_files, roster, groups):
     """
-    Find students who haven't submitted peer reviews.
-    Returns list of student info dicts.
+    Roster students without a submission, kept alongside the parsed uploads.
+    Returns tuple: (missing_submissions, {period: {group: [student info]}})
     """
     if roster is None:
-        return []
-
-    # Get set of students who have submitted
-    submitted_students = set()
-    for group_data in groups.values():
-        for eval in group_data['evaluations']:
-            submitted_students.add(eval['submitter'])
-
-    # Find missing students
-    missing = []
-    for student_info in roster['students']:
-        if student_info['name'] not in submitted_students:
-            missing.append(student_info)
-
-    return missing
-
-def extract_student_financials(uploaded_file):
+        return [], {}
+    upload_key = (core.file_sha256(roster_file), tuple(core.file_sha256(f) for f in peer_review_files))
+    return _missing_submissions(upload_key, roster, groups)
+
+def clear_saved_results():
+    """Forget every cached upload and analysis, on disk and in memory"""
+    load_data_stack()
+    disk = get_disk_cache()
+    if disk is not None:
+        disk.clear()
+    st.cache_data.clear()
+    get_financial_cache.clear()
+    st.session_state.pop(INCREMENTAL_STATE_KEY, None)
+    st.sidebar.success("Saved results cleared")
+
+def report_financial_error(filename, message):
+    """Show a financial file that failed to load in the sidebar"""
+    st.sidebar.warning(f"Could not process {filename}: {message}")
+
+@st.cache_resource
+def get_financial_cache():
+    """Process-wide cache of loaded financial files, keyed on (filename, SHA-256), backed by the disk cache"""
+    return core.ContentCache(CACHE_MAX_ENTRIES, backing=get_disk_cache())
+
+# Incremental Updates
+# With the sidebar toggle on (BAZAAR_INCREMENTAL=1 turns it on by default), a
+# re-uploaded export is merged into the groups kept from the previous load in
+# this browser session (see merge_new_submissions): only groups with new or
+# changed submissions are parsed and analyzed again, and they are marked 🆕.
+INCREMENTAL_DEFAULT = os.environ.get('BAZAAR_INCREMENTAL', '') not in ('', '0')
+INCREMENTAL_STATE_KEY = 'incremental_load'
+
+def read_peer_review_uploads(peer_review_files, workers=1):
+    """The uploaded exports as one frame with each student's latest submission, or None if all are empty"""
+    if len(peer_review_files) == 1:
+        df = core.read_peer_review_csv(BytesIO(peer_review_files[0].getvalue()))
+        return df if len(df) else None
+    return core.read_peer_review_exports([(f.name, f.getvalue()) for f in peer_review_files], workers)
+
+def load_groups_incremental(peer_review_files, keywords, workers=1):
     """
-    Extract per-student financial data from Summary sheet.
-    Returns dict of {student_name: {income, expenses, profit, inventory}}
-    Student names in Excel are "First Last" format.
+    Parsed groups for the uploads, merging changed exports into the previous load's groups.
+    Returns tuple: (groups, dirty) where dirty is the set of group IDs re-parsed
+    this run (empty when the uploads are unchanged), or None when everything
+    was parsed (first load in the session, or a new lexicon).
     """
-    try:
-        df = pd.read_excel(uploaded_file, sheet_name='Summary')
-
-        student_financials = {}
-
-        # Look for header row with "Group Member"
-        header_row_idx = None
-        for idx, row in df.iterrows():
-            first_col = df.columns[0]
-            cell_value = str(row[first_col]).lower()
-            if 'group member' in cell_value:
-                header_row_idx = idx
-                break
-
-        if header_row_idx is None:
-            return {}
-
-        # Student data starts right after header row
-        for idx, row in df.iterrows():
-            if idx <= header_row_idx:
-                continue
-
-            # Check if first column looks like a student name
-            first_col = df.columns[0]
-            student_name = str(row[first_col]).strip()
-
-            if pd.isna(student_name) or student_name == '' or student_name == 'nan':
-                continue
-
-            # Skip summary/total rows
-            if any(keyword in student_name.lower() for keyword in ['total', 'summary', 'grand']):
-                continue
+    keywords = tuple(keywords)
+    digests = tuple(core.file_sha256(f) for f in peer_review_files)
+    state = st.session_state.get(INCREMENTAL_STATE_KEY)
+
+    if state is None or state['keywords'] != keywords:
+        groups = parse_peer_review_files_cached(peer_review_files, keywords, workers)
+        st.session_state[INCREMENTAL_STATE_KEY] = {
+            'digests': digests,
+            'keywords': keywords,
+            'groups': groups,
+            'watermarks': core.submission_watermarks(groups),
+            'changed': set(),
+            'analysis': None
+        }
+        return groups, None
 
-            try:
-                # Extract financial data
-                # Handle both numeric and string values (with $ signs)
-                def parse_currency(val):
-                    if pd.isna(val):
-                        return 0
-                    if isinstance(val, (int, float)):
-                        return float(val)
-                    # Remove $ and convert
-                    val_str = str(val).replace('$', '').replace(',', '').strip()
-                    try:
-                        return float(val_str)
-                    except:
-                        return 0
-
-                income = parse_currency(row[df.columns[1]]) if len(df.columns) > 1 else 0
-                expenses = parse_currency(row[df.columns[2]]) if len(df.columns) > 2 else 0
-                profit = parse_currency(row[df.columns[3]]) if len(df.columns) > 3 else 0
-                inventory = parse_currency(row[df.columns[4]]) if len(df.columns) > 4 else 0
-
-                # Store with "First Last" format
-                student_financials[student_name] = {
-                    'income': income,
-                    'expenses': expenses,
-                    'profit': profit,
-                    'inventory': inventory
-                }
-            except Exception as e:
-                continue
+    if state['digests'] == digests:
+        return state['groups'], set()
 
-        return student_financials
-    except:
-        return {}
+    df = read_peer_review_uploads(peer_review_files, workers)
+    if df is None:
+        groups, watermarks, dirty = {}, {}, set(state['groups'])
+    else:
+        groups, watermarks, dirty = core.merge_new_submissions(
+            state['groups'], state['watermarks'], df, core.get_keyword_matcher(keywords)
+        )
+    state.update(digests=digests, groups=groups, watermarks=watermarks, changed=dirty)
+    logger.info("Incremental load: %d of %d groups changed", len(dirty), len(groups))
+    return groups, dirty
 
-def load_financial_data(uploaded_files):
+def analyze_groups_incremental(peer_review_files, financial_files, keywords, groups, group_financials,
+                               student_financials, dirty):
     """
-    Load financial data from uploaded Excel/CSV files.
-    Returns tuple: (group_financials, student_financials)
-    - group_financials: dict of {group_id: profit_value}
-    - student_financials: dict of {group_id: {student_name: {income, expenses, profit, inventory}}}
+    analyze_groups_cached for incremental loads: with the previous analysis of
+    this session and unchanged financial files, only the dirty groups are re-analyzed.
+    Returns tuple: (bases, sweep)
     """
-    group_financials = {}
-    student_financials = {}
-
-    for uploaded_file in uploaded_files:
-        filename = uploaded_file.name
-
-        # Extract group ID from filename (e.g., "2A-Income and Expense Tracking.xlsx" -> "2A")
-        match = re.match(r'^([^-]+)', filename)
-        if not match:
-            continue
-
-        group_id = match.group(1).strip()
+    state = st.session_state[INCREMENTAL_STATE_KEY]
+    financial_key = uploads_key([], financial_files)[1]
+    previous = state['analysis']
+
+    if dirty is None or previous is None or previous['financial_key'] != financial_key:
+        bases, sweep = analyze_groups_cached(peer_review_files, financial_files, keywords, groups,
+                                             group_financials, student_financials)
+    elif not dirty:
+        bases, sweep = previous['bases'], previous['sweep']
+    else:
+        bases = core.update_group_bases(previous['bases'], groups, dirty, group_financials, student_financials,
+                                        core.get_keyword_matcher(keywords))
+        sweep = core.sweep_group_flags(bases, VARIANCE_THRESHOLDS, previous=previous['sweep'], changed=dirty)
+
+    state['analysis'] = {'financial_key': financial_key, 'bases': bases, 'sweep': sweep}
+    return bases, sweep
+
+# Photo Thumbnails
+# Photos are fetched and shrunk once on the server (see thumbnails.py) and kept
+# in their own DiskCache next to the analysis cache, so browsers load them from
+# the dashboard instead of each asking Google Drive again. The in-memory
+# ContentCache in front spares the SQLite lookups on reruns.
+THUMBNAIL_MEMORY_ENTRIES = 512
+
+# How long an opened group waits for uncached photos before showing the Drive
+# link instead; the fetch carries on and the next rerun serves it from the cache
+THUMBNAIL_WAIT_SECONDS = 0.5
+
+@st.cache_resource
+def get_thumbnail_service():
+    """Process-wide thumbnail fetcher and cache, or None when BAZAAR_THUMBNAIL_PROXY=0"""
+    if not THUMBNAIL_PROXY:
+        return None
+    import thumbnails
 
+    backing = None
+    if CACHE_DIR:
         try:
-            # Load file - try to read Summary sheet first for Excel files
-            if filename.endswith('.xlsx'):
-                try:
-                    # Try to read the Summary sheet specifically
-                    df = pd.read_excel(uploaded_file, sheet_name='Summary')
-
-                    # Extract student-level financials
-                    student_financials[group_id] = extract_student_financials(uploaded_file)
-                except:
-                    # Fall back to default sheet
-                    df = pd.read_excel(uploaded_file)
-            elif filename.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            else:
-                continue
-
-            # Look for profit calculation
-            profit = calculate_profit_from_financial_file(df)
-            group_financials[group_id] = profit
-
+            backing = core.DiskCache(CACHE_DIR, int(THUMBNAIL_CACHE_MAX_MB * 1024 * 1024),
+                                     version=thumbnails.CACHE_VERSION, filename=thumbnails.CACHE_FILENAME)
         except Exception as e:
-            st.sidebar.warning(f"Could not process {filename}: {str(e)}")
+            logger.warning("Thumbnail cache kept in memory only (%s): %s", CACHE_DIR, e)
+    return thumbnails.ThumbnailService(core.ContentCache(THUMBNAIL_MEMORY_ENTRIES, backing=backing))
+
+def prefetch_thumbnails(group_rows):
+    """Start fetching the photos of these groups in the background"""
+    service = get_thumbnail_service()
+    if service is not None:
+        service.prefetch(url for row in group_rows for url in core.group_photo_urls(row[1]))
+
+# Link Checking
+# Evidence and photo links of the groups on screen are checked concurrently
+# (see link_check.py) when the sidebar toggle is on; BAZAAR_CHECK_LINKS=1 turns
+# it on by default. Results are reused across reruns for RESULT_TTL_SECONDS.
+LINK_CHECK_DEFAULT = os.environ.get('BAZAAR_CHECK_LINKS', '') not in ('', '0')
+
+# Marker shown next to a checked link, by link_check status
+LINK_BADGES = {'ok': '✅', 'restricted': '🔒', 'broken': '❌', 'unreachable': '⚠️', 'invalid': '⚠️'}
+
+@st.cache_resource
+def get_link_checker():
+    """Process-wide link checker, sharing its result cache across sessions"""
+    import link_check
+    return link_check.LinkChecker()
+
+def link_note(link_status, url):
+    """Status marker to show after a link, or '' when links aren't being checked"""
+    result = link_status.get(url) if link_status else None
+    if result is None:
+        return ""
+    if result['status'] == 'ok':
+        return f" {LINK_BADGES['ok']}"
+    return f" {LINK_BADGES[result['status']]} *{result['status']} ({result['detail']})*"
+
+def render_link_report(group_rows, link_status):
+    """Summarize checked links and list the ones that need attention"""
+    problems = []
+    for group_id, group_data, *_ in group_rows:
+        for eval in group_data['evaluations']:
+            submitter = core.short_name(group_data, eval['submitter'])
+            for url in eval.get('evidence_urls', []) + eval.get('photo_urls', []):
+                result = link_status.get(url)
+                if result is not None and result['status'] != 'ok':
+                    problems.append({'Group': group_id, 'From': submitter, 'Link': url,
+                                     'Status': result['status'], 'Detail': result['detail']})
+
+    counts = {}
+    for result in link_status.values():
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    summary = ", ".join(f"{LINK_BADGES[status]} {count} {status}" for status, count in sorted(counts.items()))
+    with st.expander(f"🔗 Evidence links checked: {summary or 'none found'}", expanded=False):
+        if problems:
+            st.dataframe(pd.DataFrame(problems), hide_index=True, use_container_width=True)
+        else:
+            st.success("Every evidence and photo link opened without a sign-in.")
+
+# Workbook Templates
+def render_template_report(workbook_templates):
+    """List the Summary sheet layout each financial workbook matched"""
+    rows = [
+        {'File': filename, 'Template': template['id'], 'Sheet': template['sheet'],
+         'Profit cell': template['profit_cell'] or "searched", 'Same as earlier file': template['known']}
+        for filename, template in workbook_templates.items()
+    ]
+    layouts = len({template['id'] for template in workbook_templates.values()})
+    with st.sidebar.expander(f"📄 Workbook templates: {layouts} layout{'s' if layouts != 1 else ''}", expanded=False):
+        st.caption("Workbooks sharing a template are read at the cells learned from the first one "
+                   "once their header labels match; \"searched\" means the profit needed the label search.")
+        st.dataframe(pd.DataFrame(rows), hide_index=True)
+
+# Class Report Export
+# The whole class as one Excel workbook and one HTML page (see class_report.py),
+# written from the cached analysis when the teacher asks for it. The files run
+# to megabytes for a large class, so only the latest couple are kept; the
+# session remembers which one it prepared so download reruns don't rebuild it.
+EXPORT_BASENAME = "bazaar_class_report"
+EXPORT_CACHE_MAX_ENTRIES = 2
+EXPORT_STATE_KEY = 'export_report_key'
+
+@st.cache_data(max_entries=EXPORT_CACHE_MAX_ENTRIES, show_spinner=False)
+def _export_class_report(upload_key, keywords, variance_threshold, _groups, _group_financials,
+                         _student_financials, _bases, _sweep, _missing_submissions):
+    import class_report
+
+    group_flags = {group_id: core.lookup_group_flags(_sweep, group_id, variance_threshold) for group_id in _groups}
+    xlsx = BytesIO()
+    html = StringIO()
+    class_report.write_class_report(
+        _groups, _group_financials, _student_financials, _bases, group_flags, variance_threshold,
+        xlsx=xlsx, html=html, missing_submissions=_missing_submissions,
+        matcher=core.get_keyword_matcher(keywords)
+    )
+    return xlsx.getvalue(), html.getvalue().encode('utf-8')
+
+def render_export(peer_review_files, financial_files, roster_file, keywords, variance_threshold,
+                  groups, group_financials, student_financials, bases, sweep, missing_submissions):
+    """Offer the class report as XLSX and HTML downloads once the teacher asks for it"""
+    with st.expander("📥 Export class report", expanded=False):
+        st.caption("Every group's flags, workload matrix, financials, contributions and feedback "
+                   f"at the current {variance_threshold}% threshold, in one file.")
+        upload_key = uploads_key(peer_review_files, financial_files) + (
+            core.file_sha256(roster_file) if roster_file is not None else None,
+        )
+        # A new upload, lexicon or threshold needs a new press of the button
+        report_key = (upload_key, tuple(keywords), variance_threshold)
+        if st.button("Prepare report files", key="prepare_export"):
+            st.session_state[EXPORT_STATE_KEY] = report_key
+        if st.session_state.get(EXPORT_STATE_KEY) != report_key:
+            return
+        with st.spinner("Writing class report..."):
+            xlsx_bytes, html_bytes = _export_class_report(
+                upload_key, tuple(keywords), variance_threshold, groups, group_financials,
+                student_financials, bases, sweep, missing_submissions
+            )
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                "Download Excel workbook", xlsx_bytes, file_name=f"{EXPORT_BASENAME}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+        with col2:
+            st.download_button("Download HTML report", html_bytes, file_name=f"{EXPORT_BASENAME}.html", mime="text/html")
+
+# Diagnostics
+# Opt-in per-stage timings; BAZAAR_DIAGNOSTICS=1 turns the sidebar toggle on by default
+DIAGNOSTICS_DEFAULT = os.environ.get('BAZAAR_DIAGNOSTICS', '') not in ('', '0')
+
+# Slowest financial files listed in the diagnostics panel
+DIAGNOSTICS_SLOWEST_FILES = 10
+
+def render_diagnostics(profiler):
+    """Show stage and per-file timings in the sidebar"""
+    records = profiler.records()
+    stages = [r for r in records if r['kind'] == 'stage']
+    files = sorted((r for r in records if r['kind'] == 'file'), key=lambda r: r['seconds'], reverse=True)
+
+    with st.sidebar.expander("🩺 Diagnostics", expanded=True):
+        st.dataframe(
+            pd.DataFrame(stages, columns=['stage', 'calls', 'seconds', 'peak_mb']).rename(columns={
+                'stage': 'Stage', 'calls': 'Calls', 'seconds': 'Seconds', 'peak_mb': 'Peak MB'
+            }),
+            hide_index=True
+        )
+        if files:
+            st.caption(f"Slowest financial files ({len(files)} loaded)")
+            st.dataframe(
+                pd.DataFrame(files[:DIAGNOSTICS_SLOWEST_FILES], columns=['file', 'seconds', 'source']).rename(columns={
+                    'file': 'File', 'seconds': 'Seconds', 'source': 'Source'
+                }),
+                hide_index=True
+            )
 
-    return group_financials, student_financials
+# Group Rendering
+# Number of group expanders rendered per page in the Group Analysis view
+GROUPS_PER_PAGE = 10
 
-def calculate_profit_from_financial_file(df):
-    """
-    Calculate profit from financial spreadsheet.
-    Expects Summary sheet with structure:
-    - Row with "Total Profit" label in first column
-    - Profit value in second column
-    """
-    # Strategy 1: Look for "Total Profit" row (matches actual Excel format)
-    for idx, row in df.iterrows():
-        # Check all columns for "Total Profit" text
-        for col_idx, col in enumerate(df.columns):
-            cell_value = str(row[col]).lower().strip()
-            if 'total profit' in cell_value:
-                # Get the value from the next column
-                if col_idx + 1 < len(df.columns):
-                    next_col = df.columns[col_idx + 1]
-                    profit_value = row[next_col]
-                    try:
-                        return float(profit_value)
-                    except:
-                        pass
-
-    # Strategy 2: Look for any cell containing "profit" in first column
-    if len(df.columns) > 1:
-        first_col = df.columns[0]
-        second_col = df.columns[1]
-
-        for idx, row in df.iterrows():
-            label = str(row[first_col]).lower()
-            if 'profit' in label and 'total' in label:
-                try:
-                    return float(row[second_col])
-                except:
-                    pass
-
-    # Strategy 3: Look for "Total Income" and "Total Expenses" to calculate
-    total_income = None
-    total_expenses = None
-
-    for idx, row in df.iterrows():
-        for col_idx, col in enumerate(df.columns):
-            cell_value = str(row[col]).lower().strip()
-
-            if 'total income' in cell_value:
-                if col_idx + 1 < len(df.columns):
-                    next_col = df.columns[col_idx + 1]
-                    try:
-                        total_income = float(row[next_col])
-                    except:
-                        pass
-
-            if 'total expense' in cell_value:
-                if col_idx + 1 < len(df.columns):
-                    next_col = df.columns[col_idx + 1]
-                    try:
-                        total_expenses = float(row[next_col])
-                    except:
-                        pass
-
-    if total_income is not None and total_expenses is not None:
-        return total_income - total_expenses
-
-    # Strategy 4: Generic fallback - look for any "profit" label
-    for idx, row in df.iterrows():
-        for col_idx, col in enumerate(df.columns):
-            cell_value = str(row[col]).lower()
-            if 'profit' in cell_value or 'net' in cell_value:
-                # Try to find a numeric value in the same row
-                for check_col in df.columns[col_idx:]:
-                    val = row[check_col]
-                    if pd.notna(val):
-                        try:
-                            return float(val)
-                        except:
-                            pass
-
-    return None
+# Newer Streamlit releases can track an expander's open state, which lets
+# display_group skip building the body of collapsed groups
+LAZY_EXPANDERS = 'on_change' in inspect.signature(st.expander).parameters
+
+def paginate(items, page_size, page):
+    """Return the items on a 1-based page"""
+    start = (page - 1) * page_size
+    return items[start:start + page_size]
 
 # Main App
 def main():
+    # Page configuration
+    st.set_page_config(
+        page_title="Bazaar Peer Review Grader",
+        page_icon="📊",
+        layout="wide"
+    )
+
     st.title("📊 Bazaar Peer Review Grader")
     st.markdown("---")
 
@@ -665,11 +514,12 @@ def main():
             key="roster"
         )
 
-        # Main peer review CSV
-        peer_review_file = st.file_uploader(
+        # Peer review CSVs (one export, or one per period/section)
+        peer_review_files = st.file_uploader(
             "Upload Peer Review CSV",
             type=['csv'],
-            help="Upload the Google Form responses CSV file",
+            accept_multiple_files=True,
+            help="Upload the Google Form responses CSV file, or one export per period to review the whole class at once",
             key="peer_review"
         )
 
@@ -687,25 +537,75 @@ def main():
         # Variance threshold slider
         variance_threshold = st.slider(
             "Workload Variance Threshold (%)",
-            min_value=5,
-            max_value=30,
-            value=15,
+            min_value=VARIANCE_THRESHOLD_MIN,
+            max_value=VARIANCE_THRESHOLD_MAX,
+            value=VARIANCE_THRESHOLD_DEFAULT,
             step=1,
             help="Flag groups where workload disagreement exceeds this percentage"
         )
 
+        # Parallel workbook decoding and multi-export parsing
+        ingest_workers = st.number_input(
+            "Ingest workers",
+            min_value=1,
+            max_value=max(os.cpu_count() or 1, 1),
+            value=DEFAULT_INGEST_WORKERS,
+            step=1,
+            help="Number of processes used to decode financial workbooks and parse several peer review exports (1 = no parallelism)"
+        )
+
+        # Red flag lexicon
+        keyword_text = st.text_input(
+            "Red flag keywords",
+            value=", ".join(RED_FLAG_KEYWORDS),
+            help="Comma-separated words to flag and highlight in feedback (whole words, case-insensitive)"
+        )
         # Filter options
         show_only_red_flags = st.checkbox(
             "Show only Red Flag groups",
             value=False
         )
 
+        groups_per_page = st.number_input(
+            "Groups per page",
+            min_value=1,
+            max_value=200,
+            value=GROUPS_PER_PAGE,
+            step=1,
+            help="Large classes render faster with fewer groups per page"
+        )
+
+        check_links = st.checkbox(
+            "Check evidence links",
+            value=LINK_CHECK_DEFAULT,
+            help="Open every evidence and photo link of the listed groups and mark dead or unshared ones"
+        )
+
+        incremental = st.checkbox(
+            "Incremental updates",
+            value=INCREMENTAL_DEFAULT,
+            help="When a newer export of the same form is uploaded, only process students with new submissions "
+                 "and re-analyze their groups; changed groups are marked 🆕"
+        )
+
+        if CACHE_DIR and st.button(
+            "Clear saved results",
+            help=f"Delete parsed uploads and analysis saved in {CACHE_DIR}"
+        ):
+            clear_saved_results()
+
+        show_diagnostics = st.checkbox(
+            "Show diagnostics",
+            value=DIAGNOSTICS_DEFAULT,
+            help="Time each processing stage and financial file, and trace peak memory (makes reruns slower)"
+        )
+
     # Main content area
-    if peer_review_file is None:
+    if not peer_review_files:
         st.info("👈 Please upload the Peer Review CSV file to get started.")
         st.markdown("""
         ### How to use this app:
-        1. Upload the Google Form peer evaluation CSV file
+        1. Upload the Google Form peer evaluation CSV file (or one per period)
         2. (Optional) Upload financial Excel/CSV files for each group
         3. Adjust the variance threshold if needed
         4. Review groups marked with red flags
@@ -713,22 +613,57 @@ def main():
         """)
         return
 
+    # First upload: load pandas, NumPy and the grading core
+    start = time.perf_counter()
+    import_timings = load_data_stack()
+    data_stack_seconds = time.perf_counter() - start
+    st.sidebar.caption(
+        f"⏱️ Data stack loaded in {sum(import_timings.values()):.2f}s "
+        f"(budget {DATA_STACK_BUDGET_SECONDS:.2f}s)"
+    )
+
+    profiler = core.StageProfiler(enabled=show_diagnostics)
+    profiler.record('load_data_stack', data_stack_seconds)
+
+    matcher = core.get_keyword_matcher([k for k in keyword_text.split(',') if k.strip()])
+
     # Load and process data
     try:
         # Load roster if provided
-        roster = load_roster(roster_file)
-
-        df = pd.read_csv(peer_review_file)
-        groups = parse_peer_review_data(df)
+        with profiler.stage('load_roster'):
+            roster = load_roster_cached(roster_file)
+
+        for peer_review_file in peer_review_files:
+            report_form_schema(peer_review_file, f"{peer_review_file.name}: " if len(peer_review_files) > 1 else "")
+        dirty = None
+        with profiler.stage('parse_peer_review'):
+            if incremental:
+                groups, dirty = load_groups_incremental(peer_review_files, matcher.keywords, ingest_workers)
+            else:
+                groups = parse_peer_review_files_cached(peer_review_files, matcher.keywords, ingest_workers)
 
         # Load financial data
         group_financials = {}
         student_financials = {}
+        workbook_templates = {}
         if financial_files:
-            group_financials, student_financials = load_financial_data(financial_files)
+            with profiler.stage('load_financial_data'):
+                group_financials, student_financials = core.load_financial_data(
+                    financial_files,
+                    cache=get_financial_cache(),
+                    workers=ingest_workers,
+                    on_error=report_financial_error,
+                    profiler=profiler,
+                    on_template=workbook_templates.__setitem__
+                )
+            if workbook_templates:
+                render_template_report(workbook_templates)
 
         # Get missing submissions
-        missing_submissions = get_missing_submissions(roster, groups)
+        with profiler.stage('missing_submissions'):
+            missing_submissions, missing_periods = missing_submissions_cached(
+                roster_file, peer_review_files, roster, groups
+            )
 
         # Display summary statistics
         st.header("Summary")
@@ -756,27 +691,85 @@ def main():
         if roster and missing_submissions:
             st.warning(f"⚠️ **{len(missing_submissions)} students have not submitted their peer reviews**")
             with st.expander("View Missing Submissions", expanded=False):
-                # Group missing by period
-                missing_by_period = {}
-                for student in missing_submissions:
-                    period = student['period']
-                    if period not in missing_by_period:
-                        missing_by_period[period] = []
-                    missing_by_period[period].append(student)
-
-                for period in sorted(missing_by_period.keys()):
-                    st.markdown(f"**Period {period}:**")
-                    for student in missing_by_period[period]:
-                        st.markdown(f"- {student['group']}: {student['first_name']} {student['last_name']}")
+                # One markdown block per period keeps whole-school rosters to a few elements
+                for period, period_groups in missing_periods.items():
+                    st.markdown(f"**Period {period}:**\n" + "\n".join(
+                        f"- {group}: {student['first_name']} {student['last_name']}"
+                        for group, students in period_groups.items() for student in students
+                    ))
 
         st.markdown("---")
 
         # Analyze and display groups
         st.header("Group Analysis")
 
+        # Flags for every slider value are precomputed, so moving the slider is a lookup
+        with profiler.stage('analyze_groups'):
+            if incremental:
+                bases, sweep = analyze_groups_incremental(
+                    peer_review_files, financial_files, matcher.keywords, groups,
+                    group_financials, student_financials, dirty
+                )
+            else:
+                bases, sweep = analyze_groups_cached(
+                    peer_review_files,
+                    financial_files,
+                    matcher.keywords,
+                    groups,
+                    group_financials,
+                    student_financials
+                )
+
+        # Groups whose submissions changed in the last incremental load
+        changed_groups = st.session_state[INCREMENTAL_STATE_KEY]['changed'] if incremental else set()
+        show_only_changed = False
+        if changed_groups:
+            st.info(f"🆕 {len(changed_groups)} group{'s' if len(changed_groups) != 1 else ''} changed since the last load: "
+                    + ", ".join(sorted(map(str, changed_groups))))
+            show_only_changed = st.checkbox("Show only changed groups", value=False, key="show_only_changed")
+
+        # Sensitivity of the red flag count to the variance threshold (free from the sweep)
+        with st.expander("📈 Groups flagged vs variance threshold", expanded=False):
+            counts = core.flagged_counts(sweep)
+            sensitivity = pd.DataFrame(
+                {'Groups flagged': counts},
+                index=pd.Index(sweep['thresholds'], name='Variance threshold (%)')
+            )
+            st.line_chart(sensitivity)
+            st.caption(f"At {variance_threshold}%: {int(counts[sweep['thresholds'].index(variance_threshold)])} of {len(groups)} groups flagged")
+
+        # The whole class in one workbook / HTML page, on request
+        with profiler.stage('export_report'):
+            render_export(peer_review_files, financial_files, roster_file, matcher.keywords, variance_threshold,
+                          groups, group_financials, student_financials, bases, sweep, missing_submissions)
+
+        # Class-wide metrics per period when the groups span several sections
+        periods = list(core.groups_by_period(groups))
+        period_filter = None
+        if len(periods) > 1:
+            red_flag_groups = {gid for gid in groups if core.lookup_group_flags(sweep, gid, variance_threshold)[0]}
+            with st.expander("📚 Summary by period", expanded=False):
+                by_period = pd.DataFrame(
+                    core.summarize_periods(groups, group_financials, red_flag_groups, roster, missing_submissions)
+                ).rename(columns={
+                    'period': 'Period', 'groups': 'Groups', 'students': 'Students', 'submissions': 'Submissions',
+                    'red_flag_groups': 'Red Flag Groups', 'groups_with_financials': 'Groups w/ Financials',
+                    'total_profit': 'Total Profit', 'missing_submissions': 'Missing Submissions'
+                })
+                st.dataframe(by_period, hide_index=True)
+            period_filter = st.selectbox(
+                "Period",
+                [None] + [period for period in periods if period is not None],
+                format_func=lambda period: "All periods" if period is None else f"Period {period}",
+                key="period_filter"
+            )
+
         # Sort groups by ID
         sorted_group_ids = sorted(groups.keys())
+        if period_filter is not None:
+            sorted_group_ids = [gid for gid in sorted_group_ids if core.group_period(gid) == period_filter]
 
+        visible_groups = []
         for group_id in sorted_group_ids:
             group_data = groups[group_id]
 
@@ -786,27 +779,58 @@ def main():
             # Get student-level financials
             group_student_financials = student_financials.get(group_id, {})
 
-            # Analyze red flags
-            is_red_flag, flags, variance_scores = analyze_group_flags(
-                group_data,
-                financial_profit,
-                variance_threshold,
-                group_student_financials
-            )
+            # Look up red flags at the current threshold
+            is_red_flag, flags = core.lookup_group_flags(sweep, group_id, variance_threshold)
+            variance_scores = bases[group_id]['variance_scores']
 
             # Filter if needed
             if show_only_red_flags and not is_red_flag:
                 continue
+            if show_only_changed and group_id not in changed_groups:
+                continue
 
+            visible_groups.append((group_id, group_data, financial_profit, is_red_flag, flags, variance_scores, group_student_financials))
+
+        # Check every link of the listed groups at once
+        link_status = None
+        if check_links and visible_groups:
+            with profiler.stage('check_links'), st.spinner("Checking evidence links..."):
+                link_status = get_link_checker().check(
+                    url for row in visible_groups for url in core.group_link_urls(row[1])
+                )
+            render_link_report(visible_groups, link_status)
+
+        # Paginate so only one page of expanders is sent to the browser
+        num_pages = max(1, math.ceil(len(visible_groups) / groups_per_page))
+        page = 1
+        if num_pages > 1:
+            page = st.number_input(f"Page (of {num_pages})", min_value=1, max_value=num_pages, value=1, step=1, key="group_page")
+        page_groups = paginate(visible_groups, groups_per_page, page)
+        if num_pages > 1:
+            first = (page - 1) * groups_per_page + 1
+            st.caption(f"Showing groups {first}-{first + len(page_groups) - 1} of {len(visible_groups)}")
+
+        # Warm the thumbnail cache for this page and the next while the teacher reads
+        prefetch_thumbnails(page_groups + paginate(visible_groups, groups_per_page, page + 1))
+
+        for group_id, group_data, financial_profit, is_red_flag, flags, variance_scores, group_student_financials in page_groups:
             # Display group
-            display_group(group_id, group_data, financial_profit, is_red_flag, flags, variance_scores, group_student_financials, variance_threshold)
+            with profiler.stage('display_group'):
+                display_group(group_id, group_data, financial_profit, is_red_flag, flags, variance_scores, group_student_financials, variance_threshold, matcher, link_status, group_id in changed_groups)
 
     except Exception as e:
         st.error(f"Error processing data: {str(e)}")
         st.exception(e)
 
-def display_group(group_id, group_data, financial_profit, is_red_flag, flags, variance_scores, student_financials=None, variance_threshold=15):
-    """Display a group's information in an expander"""
+    finally:
+        profiler.close()
+
+    if show_diagnostics:
+        profiler.log(logger)
+        render_diagnostics(profiler)
+
+def display_group(group_id, group_data, financial_profit, is_red_flag, flags, variance_scores, student_financials=None, variance_threshold=15, matcher=None, link_status=None, changed=False):
+    """Display a group's information in an expander; changed marks a group updated by the last incremental load"""
 
     # Determine header color
     if is_red_flag:
@@ -825,271 +849,163 @@ def display_group(group_id, group_data, financial_profit, is_red_flag, flags, va
     else:
         fin_indicator = "❓ No Financial Data"
 
-    # Create expander (collapsed by default)
-    with st.expander(f"{header_color} **Group {group_id}** | {status} | {fin_indicator}", expanded=False):
-
-        # Show flags if any
-        if flags:
-            st.warning("**Red Flags Detected:**")
-            for flag in flags:
-                st.markdown(f"- {flag}")
-            st.markdown("---")
-
-        # Student list
-        students = sorted(list(group_data['students']))
-        st.markdown("**Students:**")
-        for student in students:
-            student_short = student.split(' - ')[1] if ' - ' in student else student
-            st.markdown(f"- {student_short}")
-        st.markdown("---")
+    # Create expander (collapsed by default). Where Streamlit tracks the
+    # expander's open state, the body is only built while it is open.
+    label = f"{header_color} **Group {group_id}** | {status} | {fin_indicator}"
+    if changed:
+        label = f"🆕 {label} | updated"
+    if LAZY_EXPANDERS:
+        expander = st.expander(label, expanded=False, key=f"group_{group_id}", on_change="rerun")
+        if not expander.open:
+            return
+    else:
+        expander = st.expander(label, expanded=False)
+
+    with expander:
+        display_group_details(group_id, group_data, flags, variance_scores, student_financials, variance_threshold, matcher, link_status)
+
+def display_group_details(group_id, group_data, flags, variance_scores, student_financials=None, variance_threshold=15, matcher=None, link_status=None):
+    """
+    Display the body of a group's expander: flags, matrix, financials and feedback.
+    link_status ({url: result} from the link checker) adds a status marker to each link.
+    """
 
-        # Workload Analysis Table
-        st.subheader("Workload Distribution Matrix")
-        st.markdown("*Rows = students being evaluated | Columns = evaluators | Diagonal (★) = self-evaluation*")
+    # Show flags if any
+    if flags:
+        st.warning("**Red Flags Detected:**")
+        for flag in flags:
+            st.markdown(f"- {flag}")
+        st.markdown("---")
 
-        # Debug: show evaluation data
-        if st.checkbox("Show debug info (evaluations)", value=False, key=f"debug_{group_id}"):
-            st.write("**Evaluations data:**")
-            for eval in group_data['evaluations']:
-                st.write(f"Submitter: {eval['submitter']}")
-                st.write(f"Percentages: {eval['percentages']}")
-                st.write("---")
+    # Student list
+    names = core.student_names(group_data)
+    students = sorted(list(group_data['students']))
+    st.markdown("**Students:**")
+    for student in students:
+        st.markdown(f"- {names[student].short}")
+    st.markdown("---")
 
-        # Create matrix showing who said what about whom
-        # This should be a square matrix: all students x all students
-        matrix_data = []
+    # Workload Analysis Table
+    st.subheader("Workload Distribution Matrix")
+    st.markdown("*Rows = students being evaluated | Columns = evaluators | Diagonal (★) = self-evaluation*")
 
-        # Create a map of who submitted evaluations
-        evaluations_map = {}
+    # Debug: show evaluation data
+    if st.checkbox("Show debug info (evaluations)", value=False, key=f"debug_{group_id}"):
+        st.write("**Evaluations data:**")
         for eval in group_data['evaluations']:
-            evaluations_map[eval['submitter']] = eval
-
-        # Get short names for all students
-        student_shorts = {}
-        for student in students:
-            student_short = student.split(' - ')[1] if ' - ' in student else student
-            student_shorts[student] = student_short
-
-        # Calculate expected contribution and threshold for highlighting
-        num_students = len(students)
-        expected_pct = 100.0 / num_students
-        low_threshold = expected_pct * 0.6  # Same threshold as red flag detection
-
-        for student_being_evaluated in students:
-            student_eval_short = student_shorts[student_being_evaluated]
-            row = {'Student': student_eval_short}
-
-            # For each potential evaluator (all students in group)
-            for evaluator in students:
-                evaluator_short = student_shorts[evaluator]
-
-                # Check if this evaluator submitted a form
-                if evaluator in evaluations_map:
-                    eval = evaluations_map[evaluator]
-                    pct = eval['percentages'].get(student_being_evaluated, 0)
-
-                    # Highlight low percentages in red
-                    if pct < low_threshold:
-                        pct_display = f"🔴 {pct}%"
-                    else:
-                        pct_display = f"{pct}%"
-
-                    # Mark self-evaluation with a star
-                    if evaluator == student_being_evaluated:
-                        row[evaluator_short] = f"{pct_display} ★"
-                    else:
-                        row[evaluator_short] = pct_display
-                else:
-                    # Evaluator didn't submit
-                    row[evaluator_short] = "-"
+            st.write(f"Submitter: {eval['submitter']}")
+            st.write(f"Percentages: {eval['percentages']}")
+            st.write("---")
 
-            # Add variance (highlight if above threshold)
-            variance = variance_scores.get(student_being_evaluated, 0)
-            if variance > variance_threshold:
-                row['Variance'] = f"🔴 ±{variance:.1f}%"
-            else:
-                row['Variance'] = f"±{variance:.1f}%"
+    # Create matrix showing who said what about whom
+    matrix_df = core.build_workload_matrix(group_data, variance_scores, variance_threshold)
+    if matrix_df is not None:
+        st.dataframe(matrix_df, use_container_width=True)
 
-            matrix_data.append(row)
+    st.markdown("---")
 
-        if matrix_data:
-            matrix_df = pd.DataFrame(matrix_data)
-            # Set index to start at 1
-            matrix_df.index = range(1, len(matrix_df) + 1)
-            st.dataframe(matrix_df, use_container_width=True)
+    # Student Financial Breakdown (if available)
+    if student_financials:
+        st.subheader("Individual Student Financials")
 
-        st.markdown("---")
+        fin_df = core.build_student_financial_table(group_data, student_financials)
+        if fin_df is not None:
+            st.dataframe(fin_df, use_container_width=True)
+        else:
+            st.info("Individual student financial data not found in Summary sheet")
 
-        # Student Financial Breakdown (if available)
-        if student_financials:
-            st.subheader("Individual Student Financials")
-
-            fin_data = []
-            all_incomes = []
-
-            # First pass: collect all data
-            for student in students:
-                # Extract student name from format "GroupID - Last, First"
-                student_short = student.split(' - ')[1] if ' - ' in student else student
-
-                # Convert "Last, First" to "First Last" to match Excel format
-                if ', ' in student_short:
-                    parts = student_short.split(', ')
-                    if len(parts) == 2:
-                        excel_name = f"{parts[1]} {parts[0]}"  # "First Last"
-                    else:
-                        excel_name = student_short
-                else:
-                    excel_name = student_short
+        st.markdown("---")
 
-                # Try to match student name in financials
-                student_fin = None
+    # Work Descriptions
+    st.subheader("Work Contributions")
 
-                # Try exact match first
-                if excel_name in student_financials:
-                    student_fin = student_financials[excel_name]
-                else:
-                    # Try partial match (last name or first name)
-                    for fin_name, fin_info in student_financials.items():
-                        # Check if last names match (first word of excel_name vs last word of fin_name)
-                        excel_parts = excel_name.split()
-                        fin_parts = fin_name.split()
-                        if excel_parts and fin_parts and excel_parts[-1].lower() == fin_parts[-1].lower():
-                            student_fin = fin_info
-                            break
-
-                if student_fin:
-                    all_incomes.append(student_fin['income'])
-                    fin_data.append({
-                        'student_short': student_short,
-                        'income': student_fin['income'],
-                        'expenses': student_fin['expenses'],
-                        'profit': student_fin['profit'],
-                        'inventory': student_fin['inventory']
-                    })
-
-            # Calculate average income for highlighting
-            avg_income = sum(all_incomes) / len(all_incomes) if all_incomes else 0
-            low_sales_threshold = avg_income * 0.5
-
-            # Second pass: format with highlighting
-            formatted_data = []
-            for item in fin_data:
-                # Highlight low income
-                if item['income'] < low_sales_threshold and avg_income > 10:
-                    income_display = f"🔴 ${item['income']:.2f}"
-                else:
-                    income_display = f"${item['income']:.2f}"
+    # Fetch every photo thumbnail in the group at once (cache hits return immediately)
+    service = get_thumbnail_service()
+    photo_thumbnails = (
+        service.get_many(core.group_photo_urls(group_data), timeout=THUMBNAIL_WAIT_SECONDS)
+        if service is not None else {}
+    )
 
-                # Highlight negative profit
-                if item['profit'] < 0:
-                    profit_display = f"🔴 ${item['profit']:.2f}"
-                else:
-                    profit_display = f"${item['profit']:.2f}"
-
-                formatted_data.append({
-                    'Student': item['student_short'],
-                    'Income': income_display,
-                    'Expenses': f"${item['expenses']:.2f}",
-                    'Profit': profit_display,
-                    'Inventory Value': f"${item['inventory']:.2f}"
-                })
+    for eval in group_data['evaluations']:
+        evaluator = core.short_name(group_data, eval['submitter'])
+        st.markdown(f"**Evaluation by {evaluator}:**")
 
-            if formatted_data:
-                fin_df = pd.DataFrame(formatted_data)
-                # Set index to start at 1
-                fin_df.index = range(1, len(fin_df) + 1)
-                st.dataframe(fin_df, use_container_width=True)
-            else:
-                st.info("Individual student financial data not found in Summary sheet")
+        for student, descriptions in eval['work_descriptions'].items():
+            student_short = core.short_name(group_data, student)
 
-            st.markdown("---")
+            with st.container():
+                st.markdown(f"*{student_short}:*")
 
-        # Work Descriptions
-        st.subheader("Work Contributions")
+                work_summary = []
+                for work_type, desc in descriptions.items():
+                    if desc and desc != '' and not pd.isna(desc):
+                        highlighted_desc = core.highlight_spans(desc, core.work_description_hits(eval, student, work_type, matcher))
+                        work_summary.append(f"**{work_type.title()}:** {highlighted_desc}")
 
-        for eval in group_data['evaluations']:
-            evaluator = eval['submitter'].split(' - ')[1] if ' - ' in eval['submitter'] else eval['submitter']
-            st.markdown(f"**Evaluation by {evaluator}:**")
-
-            for student, descriptions in eval['work_descriptions'].items():
-                student_short = student.split(' - ')[1] if ' - ' in student else student
-
-                with st.container():
-                    st.markdown(f"*{student_short}:*")
-
-                    work_summary = []
-                    for work_type, desc in descriptions.items():
-                        if desc and desc != '' and not pd.isna(desc):
-                            highlighted_desc = highlight_keywords(desc)
-                            work_summary.append(f"**{work_type.title()}:** {highlighted_desc}")
-
-                    if work_summary:
-                        for item in work_summary:
-                            st.markdown(f"  - {item}", unsafe_allow_html=True)
-                    else:
-                        st.markdown("  - *(No description provided)*")
-
-            # Show evidence links for this evaluator
-            if eval.get('evidence_urls'):
-                st.markdown(f"📎 **Evidence from {evaluator}:**")
-                for url in eval['evidence_urls']:
-                    st.markdown(f"  - [{url}]({url})")
-
-            # Show photo thumbnails for this evaluator
-            if eval.get('photo_urls'):
-                st.markdown(f"📸 **Photos from {evaluator}:**")
-
-                # Separate images by type
-                image_urls = []
-                heic_urls = []
-
-                for url in eval['photo_urls']:
-                    # Check if URL is likely a HEIC file
-                    if '.heic' in url.lower() or 'heic' in url.lower():
-                        heic_urls.append(url)
-                    else:
-                        image_urls.append(url)
-
-                # Display regular images as thumbnails
-                if image_urls:
-                    cols = st.columns(min(len(image_urls), 4))  # Max 4 images per row
-                    for idx, url in enumerate(image_urls):
-                        with cols[idx % 4]:
-                            thumbnail_url = convert_gdrive_to_thumbnail(url)
-                            st.markdown(f"[![Photo]({thumbnail_url})]({url})")
-
-                # Display HEIC files as links
-                if heic_urls:
-                    st.markdown("  *HEIC files (click to view):*")
-                    for url in heic_urls:
-                        st.markdown(f"  - [View HEIC photo]({url})")
-
-            st.markdown("")
+                if work_summary:
+                    for item in work_summary:
+                        st.markdown(f"  - {item}", unsafe_allow_html=True)
+                else:
+                    st.markdown("  - *(No description provided)*")
+
+        # Show evidence links for this evaluator
+        if eval.get('evidence_urls'):
+            st.markdown(f"📎 **Evidence from {evaluator}:**")
+            for url in eval['evidence_urls']:
+                st.markdown(f"  - [{url}]({url}){link_note(link_status, url)}")
+
+        # Show photo thumbnails for this evaluator
+        if eval.get('photo_urls'):
+            st.markdown(f"📸 **Photos from {evaluator}:**")
+
+            # Separate images by type
+            image_urls, heic_urls = core.split_photo_urls(eval['photo_urls'])
+
+            # Display regular images as thumbnails, served from the thumbnail
+            # cache where the server could fetch them and from Drive otherwise
+            if image_urls:
+                cols = st.columns(min(len(image_urls), 4))  # Max 4 images per row
+                for idx, url in enumerate(image_urls):
+                    with cols[idx % 4]:
+                        thumbnail = photo_thumbnails.get(url)
+                        if thumbnail is not None:
+                            st.image(thumbnail)
+                            st.markdown(f"[Open photo]({url}){link_note(link_status, url)}")
+                        else:
+                            thumbnail_url = core.convert_gdrive_to_thumbnail(url)
+                            st.markdown(f"[![Photo]({thumbnail_url})]({url}){link_note(link_status, url)}")
+
+            # Display HEIC files as links
+            if heic_urls:
+                st.markdown("  *HEIC files (click to view):*")
+                for url in heic_urls:
+                    st.markdown(f"  - [View HEIC photo]({url}){link_note(link_status, url)}")
+
+        st.markdown("")
 
-        st.markdown("---")
+    st.markdown("---")
 
-        # Feedback Section
-        st.subheader("Feedback & Reflections")
+    # Feedback Section
+    st.subheader("Feedback & Reflections")
 
-        for feedback in group_data['feedback']:
-            submitter = feedback['submitter'].split(' - ')[1] if ' - ' in feedback['submitter'] else feedback['submitter']
+    for feedback in group_data['feedback']:
+        submitter = core.short_name(group_data, feedback['submitter'])
 
-            st.markdown(f"**From {submitter}:**")
+        st.markdown(f"**From {submitter}:**")
 
-            if feedback.get('challenges'):
-                highlighted = highlight_keywords(feedback['challenges'])
-                st.markdown(f"*Challenges:* {highlighted}", unsafe_allow_html=True)
+        if feedback.get('challenges'):
+            highlighted = core.highlight_spans(feedback['challenges'], core.feedback_hits(feedback, 'challenges', matcher))
+            st.markdown(f"*Challenges:* {highlighted}", unsafe_allow_html=True)
 
-            if feedback.get('good_stuff'):
-                highlighted = highlight_keywords(feedback['good_stuff'])
-                st.markdown(f"*The Good Stuff:* {highlighted}", unsafe_allow_html=True)
+        if feedback.get('good_stuff'):
+            highlighted = core.highlight_spans(feedback['good_stuff'], core.feedback_hits(feedback, 'good_stuff', matcher))
+            st.markdown(f"*The Good Stuff:* {highlighted}", unsafe_allow_html=True)
 
-            if feedback.get('advice'):
-                highlighted = highlight_keywords(feedback['advice'])
-                st.markdown(f"*Advice:* {highlighted}", unsafe_allow_html=True)
+        if feedback.get('advice'):
+            highlighted = core.highlight_spans(feedback['advice'], core.feedback_hits(feedback, 'advice', matcher))
+            st.markdown(f"*Advice:* {highlighted}", unsafe_allow_html=True)
 
-            st.markdown("")
+        st.markdown("")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,248 @@
+"""
+Stage benchmarks for the Bazaar Peer Review Grader.
+
+Generates a synthetic class (see synthetic_data.py) and times each processing
+stage on its own, so a regression can be pinned to one stage instead of
+showing up as "the dashboard got slower":
+
+    python benchmark.py --submissions 10000 --workbooks 500
+    python benchmark.py --data-dir out_dir --workers 4 --json
+
+Each stage reports its best wall time over --repeat runs, throughput, and the
+peak traced memory (tracemalloc) from one extra run.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+import synthetic_data
+from grader_core import (
+    VARIANCE_THRESHOLD_DEFAULT,
+    FEEDBACK_COLUMNS,
+    WORK_TYPES,
+    analyze_group_base,
+    analyze_group_flags,
+    build_student_financial_table,
+    build_workload_matrix,
+    calculate_profit_from_financial_file,
+    feedback_hits,
+    get_keyword_matcher,
+    highlight_spans,
+    index_keyword_hits,
+    load_financial_data,
+    merge_new_submissions,
+    named_buffer,
+    parse_peer_review_data,
+    read_peer_review_csv,
+    read_sheet_frame,
+    submission_watermarks,
+    update_group_bases,
+    work_description_hits,
+)
+
+def measure(name, fn, items, unit, repeat=3, setup=None):
+    """
+    Time fn(*setup()) repeat times and once more under tracemalloc.
+    setup runs outside the timed region (e.g. to rewind file buffers).
+    Returns dict with the stage's best/mean seconds, throughput and peak memory.
+    """
+    setup = setup or (lambda: ())
+    times = []
+    for _ in range(repeat):
+        args = setup()
+        gc.collect()
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+
+    args = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(times)
+    return {
+        'stage': name,
+        'items': items,
+        'unit': unit,
+        'best_seconds': best,
+        'mean_seconds': sum(times) / len(times),
+        'per_second': items / best if best > 0 else float('inf'),
+        'peak_mb': peak / (1024 * 1024)
+    }
+
+def read_files(directory):
+    """Read every file in a directory as (filename, bytes), sorted by name"""
+    payloads = []
+    for filename in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, filename), 'rb') as f:
+            payloads.append((filename, f.read()))
+    return payloads
+
+def summary_frames(payloads):
+    """Decode each workbook's Summary sheet up front, so profit parsing can be timed alone"""
+    import openpyxl
+
+    frames = []
+    for filename, data in payloads:
+        workbook = openpyxl.load_workbook(named_buffer(filename, data), read_only=True, data_only=True)
+        try:
+            sheet = workbook['Summary'] if 'Summary' in workbook.sheetnames else workbook.worksheets[0]
+            frames.append(read_sheet_frame(sheet.iter_rows(values_only=True)))
+        finally:
+            workbook.close()
+    return frames
+
+def prepare_group_display(group_data, base, students, threshold, matcher):
+    """Everything display_group_details computes before handing it to Streamlit"""
+    build_workload_matrix(group_data, base['variance_scores'], threshold)
+    if students:
+        build_student_financial_table(group_data, students)
+    for eval in group_data['evaluations']:
+        for student in eval['work_descriptions']:
+            for work_type in WORK_TYPES:
+                highlight_spans(eval['work_descriptions'][student][work_type],
+                                work_description_hits(eval, student, work_type, matcher))
+    for feedback in group_data['feedback']:
+        for field in FEEDBACK_COLUMNS:
+            highlight_spans(feedback.get(field, ''), feedback_hits(feedback, field, matcher))
+
+def run_benchmarks(data_dir, repeat=3, workers=1, threshold=VARIANCE_THRESHOLD_DEFAULT):
+    """Run every stage against a generated dataset directory; returns a list of stage results"""
+    peer_review_path = os.path.join(data_dir, 'peer_review.csv')
+    with open(peer_review_path, 'rb') as f:
+        peer_review_bytes = f.read()
+    payloads = read_files(os.path.join(data_dir, 'workbooks'))
+    matcher = get_keyword_matcher()
+    results = []
+
+    df = pd.read_csv(named_buffer('peer_review.csv', peer_review_bytes))
+    submissions = len(df)
+    results.append(measure(
+        'read_csv', lambda buffer: pd.read_csv(buffer), submissions, 'rows', repeat,
+        setup=lambda: (named_buffer('peer_review.csv', peer_review_bytes),)
+    ))
+    results.append(measure(
+        'read_peer_review_csv', lambda buffer: read_peer_review_csv(buffer), submissions, 'rows', repeat,
+        setup=lambda: (named_buffer('peer_review.csv', peer_review_bytes),)
+    ))
+    results.append(measure(
+        'parse_peer_review_data', lambda: parse_peer_review_data(df.copy()), submissions, 'rows', repeat
+    ))
+
+    groups = index_keyword_hits(parse_peer_review_data(df.copy()), matcher)
+    results.append(measure(
+        'index_keyword_hits', lambda: index_keyword_hits(groups, matcher), len(groups), 'groups', repeat
+    ))
+
+    # Re-upload after the last 5% of responses arrived: only their groups are re-parsed
+    earlier = index_keyword_hits(parse_peer_review_data(df.iloc[:len(df) - len(df) // 20].copy()), matcher)
+    watermarks = submission_watermarks(earlier)
+    results.append(measure(
+        'merge_new_submissions', lambda: merge_new_submissions(earlier, watermarks, df.copy(), matcher),
+        submissions, 'rows', repeat
+    ))
+
+    def financial_buffers():
+        return ([named_buffer(filename, data) for filename, data in payloads],)
+
+    results.append(measure(
+        'load_financial_data', lambda files: load_financial_data(files), len(payloads), 'files', repeat,
+        setup=financial_buffers
+    ))
+    if workers > 1:
+        results.append(measure(
+            f'load_financial_data[workers={workers}]', lambda files: load_financial_data(files, workers=workers),
+            len(payloads), 'files', repeat, setup=financial_buffers
+        ))
+
+    frames = summary_frames(payloads)
+    results.append(measure(
+        'calculate_profit_from_financial_file',
+        lambda: [calculate_profit_from_financial_file(frame) for frame in frames],
+        len(frames), 'files', repeat
+    ))
+
+    group_financials, student_financials = load_financial_data(financial_buffers()[0])
+    results.append(measure(
+        'analyze_group_flags',
+        lambda: [
+            analyze_group_flags(group_data, group_financials.get(group_id), threshold,
+                                student_financials.get(group_id), matcher)
+            for group_id, group_data in groups.items()
+        ],
+        len(groups), 'groups', repeat
+    ))
+
+    bases = {
+        group_id: analyze_group_base(group_data, group_financials.get(group_id), student_financials.get(group_id), matcher)
+        for group_id, group_data in groups.items()
+    }
+    dirty = merge_new_submissions(earlier, watermarks, df.copy(), matcher)[2]
+    results.append(measure(
+        'update_group_bases',
+        lambda: update_group_bases(bases, groups, dirty, group_financials, student_financials, matcher),
+        len(dirty), 'groups', repeat
+    ))
+    results.append(measure(
+        'display_group_prep',
+        lambda: [
+            prepare_group_display(group_data, bases[group_id], student_financials.get(group_id), threshold, matcher)
+            for group_id, group_data in groups.items()
+        ],
+        len(groups), 'groups', repeat
+    ))
+
+    return results
+
+def format_results(results):
+    lines = [f"{'stage':<40} {'items':>8} {'best s':>9} {'mean s':>9} {'per second':>16} {'peak MB':>9}"]
+    for r in results:
+        rate = f"{r['per_second']:,.0f} {r['unit']}"
+        lines.append(f"{r['stage']:<40} {r['items']:>8} {r['best_seconds']:>9.3f} {r['mean_seconds']:>9.3f} "
+                     f"{rate:>16} {r['peak_mb']:>9.1f}")
+    return '\n'.join(lines)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Time each grading stage on a synthetic class.")
+    parser.add_argument('--submissions', type=int, default=10000, help="Form responses to generate (default 10000)")
+    parser.add_argument('--workbooks', type=int, default=500, help="Financial workbooks to generate (default 500)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default 0)")
+    parser.add_argument('--data-dir', help="Use (or create) this dataset directory instead of a temporary one")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage (default 3)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Also time load_financial_data with this many processes (default 1)")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        if not os.path.exists(os.path.join(data_dir, 'peer_review.csv')):
+            info = synthetic_data.generate_dataset(data_dir, args.submissions, args.workbooks, args.seed)
+            print(f"Generated {info['submissions']} submissions, {info['groups']} groups, "
+                  f"{info['workbook_count']} workbooks", file=sys.stderr)
+        results = run_benchmarks(data_dir, args.repeat, args.workers)
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        print(format_results(results))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,360 @@
+"""
+Class report export for the Bazaar Peer Review Grader.
+
+Writes every group's flags, workload matrix, financials, contributions and
+feedback (red flag keywords highlighted) to one Excel workbook and/or one
+static HTML page, in a single streamed pass over the groups. The analysis is
+passed in (see app.py's export panel and grade_cli.py --format xlsx/html).
+"""
+from datetime import datetime
+from html import escape
+
+from grader_core import (
+    FEEDBACK_COLUMNS,
+    WORK_TYPES,
+    build_student_financial_table,
+    build_workload_matrix,
+    feedback_hits,
+    group_period,
+    hit_keywords,
+    short_name,
+    student_names,
+    work_description_hits,
+)
+
+# Feedback field headings, as the dashboard shows them
+FEEDBACK_LABELS = {
+    'challenges': 'Challenges',
+    'good_stuff': 'The Good Stuff',
+    'advice': 'Advice'
+}
+
+# Keyword highlight in the workbook (bold dark red) and the HTML page
+XLSX_HIGHLIGHT_COLOR = 'C00000'
+HTML_STYLE = """
+body { font-family: -apple-system, Segoe UI, Helvetica, Arial, sans-serif; margin: 2em; color: #222; }
+h1 { margin-bottom: 0.2em; }
+section { border-top: 2px solid #ddd; margin-top: 2em; padding-top: 0.5em; }
+.red { color: #b00020; }
+.ok { color: #1b7f3b; }
+.flags { background: #fff4e5; border-left: 4px solid #f0a020; padding: 0.5em 1em; }
+table { border-collapse: collapse; margin: 0.5em 0 1em; }
+th, td { border: 1px solid #ccc; padding: 4px 8px; text-align: left; vertical-align: top; }
+th { background: #f3f3f3; }
+mark { background-color: #ffcccc; padding: 0 2px; font-weight: bold; }
+.muted { color: #777; }
+"""
+
+# Sheet name: column headers
+XLSX_SHEETS = {
+    'Groups': ['Group', 'Period', 'Status', 'Profit', 'Max Variance', 'Submissions', 'Students', 'Flags'],
+    'Workload': None,  # one block per group: title row, matrix header, matrix rows
+    'Financials': ['Group', 'Student', 'Income', 'Expenses', 'Profit', 'Inventory Value'],
+    'Contributions': ['Group', 'Evaluation by', 'About', 'Work Type', 'Description', 'Keywords'],
+    'Feedback': ['Group', 'From', 'Field', 'Text', 'Keywords'],
+    'Links': ['Group', 'From', 'Kind', 'URL'],
+    'Missing Submissions': ['Period', 'Group', 'First Name', 'Last Name']
+}
+
+def highlight_html(text, hits):
+    """HTML-escape text, wrapping each (start, end, keyword) hit in <mark>"""
+    parts = []
+    last = 0
+    for start, end, _ in hits:
+        parts.append(escape(text[last:start]))
+        parts.append(f"<mark>{escape(text[start:end])}</mark>")
+        last = end
+    parts.append(escape(text[last:]))
+    return ''.join(parts)
+
+def _has_text(value):
+    return isinstance(value, str) and value != ''
+
+def group_sections(groups, group_financials, student_financials, bases, group_flags,
+                   variance_threshold, matcher=None):
+    """
+    Yield one group's report content at a time, in group ID order, built from
+    the precomputed analysis: bases {group_id: analyze_group_base result} and
+    group_flags {group_id: (is_red_flag, flags)} at variance_threshold.
+    """
+    for group_id in sorted(groups):
+        group_data = groups[group_id]
+        is_red_flag, flags = group_flags[group_id]
+        variance_scores = bases[group_id]['variance_scores']
+        students = student_financials.get(group_id, {})
+        names = student_names(group_data)
+
+        contributions = []
+        links = []
+        for eval in group_data['evaluations']:
+            evaluator = short_name(group_data, eval['submitter'])
+            for student, descriptions in eval['work_descriptions'].items():
+                for work_type in WORK_TYPES:
+                    desc = descriptions.get(work_type)
+                    if _has_text(desc):
+                        hits = work_description_hits(eval, student, work_type, matcher)
+                        contributions.append((evaluator, short_name(group_data, student), work_type.title(), desc, hits))
+            links.extend((evaluator, 'Evidence', url) for url in eval.get('evidence_urls', []))
+            links.extend((evaluator, 'Photo', url) for url in eval.get('photo_urls', []))
+
+        feedback = []
+        for entry in group_data['feedback']:
+            submitter = short_name(group_data, entry['submitter'])
+            for field in FEEDBACK_COLUMNS:
+                text = entry.get(field)
+                if _has_text(text):
+                    feedback.append((submitter, FEEDBACK_LABELS[field], text, feedback_hits(entry, field, matcher)))
+
+        yield {
+            'group_id': group_id,
+            'period': group_period(group_id),
+            'is_red_flag': is_red_flag,
+            'flags': flags,
+            'profit': group_financials.get(group_id),
+            'max_variance': bases[group_id]['max_variance'],
+            'submissions': len(group_data['evaluations']),
+            'students': [names[student].short for student in sorted(group_data['students'])],
+            'matrix': build_workload_matrix(group_data, variance_scores, variance_threshold),
+            'financials': build_student_financial_table(group_data, students) if students else None,
+            'contributions': contributions,
+            'feedback': feedback,
+            'links': links
+        }
+
+# Excel
+class XlsxReportWriter:
+    """Streams report sections into a write-only openpyxl workbook, one sheet per kind of content"""
+
+    def __init__(self):
+        # openpyxl is only needed when a workbook is exported
+        import openpyxl
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+        from openpyxl.cell.rich_text import CellRichText, TextBlock
+        from openpyxl.cell.text import InlineFont
+        from openpyxl.styles import Font
+
+        self._cell = WriteOnlyCell
+        self._illegal = ILLEGAL_CHARACTERS_RE
+        self._rich_text = CellRichText
+        self._text_block = TextBlock
+        self._highlight = InlineFont(b=True, color=XLSX_HIGHLIGHT_COLOR)
+        self._bold = Font(bold=True)
+
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheets = {}
+        for name, header in XLSX_SHEETS.items():
+            sheet = self.workbook.create_sheet(name)
+            if header is not None:
+                sheet.freeze_panes = 'A2'
+                sheet.append([self._bold_cell(sheet, column) for column in header])
+            self.sheets[name] = sheet
+
+    def _text(self, text):
+        return self._illegal.sub('', text)
+
+    def _text_cell(self, sheet, value):
+        """Cell value for append(); text starting with '=' is kept as text instead of becoming a formula"""
+        if not isinstance(value, str):
+            return value
+        value = self._text(value)
+        if not value.startswith('='):
+            return value
+        cell = self._cell(sheet, value=value)
+        cell.data_type = 's'
+        return cell
+
+    def _bold_cell(self, sheet, value):
+        cell = self._cell(sheet, value=self._text(str(value)))
+        cell.font = self._bold
+        return cell
+
+    def _highlighted_cell(self, sheet, text, hits):
+        if not hits:
+            return self._text_cell(sheet, text)
+        parts = []
+        last = 0
+        for start, end, _ in hits:
+            if start > last:
+                parts.append(self._text(text[last:start]))
+            parts.append(self._text_block(self._highlight, self._text(text[start:end])))
+            last = end
+        if last < len(text):
+            parts.append(self._text(text[last:]))
+        return self._cell(sheet, value=self._rich_text(parts))
+
+    def _append(self, name, values):
+        sheet = self.sheets[name]
+        sheet.append([self._text_cell(sheet, value) for value in values])
+
+    def write_section(self, section):
+        group_id = section['group_id']
+        self._append('Groups', [
+            group_id, section['period'], 'RED FLAG' if section['is_red_flag'] else 'OK', section['profit'],
+            round(section['max_variance'], 1), section['submissions'],
+            '; '.join(section['students']), '; '.join(section['flags'])
+        ])
+
+        matrix = section['matrix']
+        if matrix is not None:
+            sheet = self.sheets['Workload']
+            sheet.append([self._bold_cell(sheet, f"Group {group_id}")])
+            sheet.append([self._bold_cell(sheet, column) for column in matrix.columns])
+            for row in matrix.to_numpy(dtype=object).tolist():
+                self._append('Workload', row)
+            sheet.append([])
+
+        financials = section['financials']
+        if financials is not None:
+            for row in financials.to_numpy(dtype=object).tolist():
+                self._append('Financials', [group_id] + row)
+
+        sheet = self.sheets['Contributions']
+        for evaluator, student, work_type, desc, hits in section['contributions']:
+            sheet.append([
+                self._text_cell(sheet, group_id), self._text_cell(sheet, evaluator), self._text_cell(sheet, student),
+                self._text_cell(sheet, work_type), self._highlighted_cell(sheet, desc, hits),
+                self._text_cell(sheet, ', '.join(hit_keywords(hits)))
+            ])
+
+        sheet = self.sheets['Feedback']
+        for submitter, label, text, hits in section['feedback']:
+            sheet.append([
+                self._text_cell(sheet, group_id), self._text_cell(sheet, submitter), self._text_cell(sheet, label),
+                self._highlighted_cell(sheet, text, hits), self._text_cell(sheet, ', '.join(hit_keywords(hits)))
+            ])
+
+        for evaluator, kind, url in section['links']:
+            self._append('Links', [group_id, evaluator, kind, url])
+
+    def write_missing(self, missing_submissions):
+        for student in missing_submissions:
+            self._append('Missing Submissions', [student['period'], student['group'], student['first_name'], student['last_name']])
+
+    def save(self, output):
+        self.workbook.save(output)
+
+# HTML
+def _html_table(df):
+    """DataFrame as an escaped HTML table (the 1-based index is dropped)"""
+    return df.to_html(index=False, escape=True, border=0)
+
+class HtmlReportWriter:
+    """Streams report sections to a text stream as one self-contained HTML page"""
+
+    def __init__(self, output):
+        self.output = output
+
+    def write_header(self, title, summary, contents):
+        """Page head, summary and a contents list of (group_id, is_red_flag)"""
+        write = self.output.write
+        write(f"<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"utf-8\">\n<title>{escape(title)}</title>\n")
+        write(f"<style>{HTML_STYLE}</style>\n</head>\n<body>\n<h1>{escape(title)}</h1>\n")
+        write("<p class=\"muted\">" + escape(" · ".join(f"{label}: {value}" for label, value in summary.items())) + "</p>\n")
+        write("<h2>Groups</h2>\n<p>")
+        write(" ".join(
+            f"<a href=\"#group-{escape(str(group_id))}\" class=\"{'red' if is_red_flag else 'ok'}\">"
+            f"{'🔴' if is_red_flag else '🟢'} {escape(str(group_id))}</a>"
+            for group_id, is_red_flag in contents
+        ))
+        write("</p>\n")
+
+    def write_section(self, section):
+        write = self.output.write
+        group_id = escape(str(section['group_id']))
+        status = 'RED FLAG' if section['is_red_flag'] else 'OK'
+        profit = section['profit']
+        profit_text = "No Financial Data" if profit is None else f"${profit:.2f}"
+        write(f"<section id=\"group-{group_id}\">\n")
+        write(f"<h2 class=\"{'red' if section['is_red_flag'] else 'ok'}\">Group {group_id} | {status} | {escape(profit_text)}</h2>\n")
+
+        if section['flags']:
+            write("<div class=\"flags\"><strong>Red Flags Detected:</strong><ul>")
+            write("".join(f"<li>{escape(flag)}</li>" for flag in section['flags']))
+            write("</ul></div>\n")
+
+        write("<p><strong>Students:</strong> " + escape(", ".join(section['students'])) + "</p>\n")
+
+        if section['matrix'] is not None:
+            write("<h3>Workload Distribution Matrix</h3>\n")
+            write("<p class=\"muted\">Rows = students being evaluated | Columns = evaluators | ★ = self-evaluation</p>\n")
+            write(_html_table(section['matrix']) + "\n")
+
+        if section['financials'] is not None:
+            write("<h3>Individual Student Financials</h3>\n")
+            write(_html_table(section['financials']) + "\n")
+
+        if section['contributions']:
+            write("<h3>Work Contributions</h3>\n<table><tr><th>Evaluation by</th><th>About</th><th>Work Type</th><th>Description</th></tr>\n")
+            for evaluator, student, work_type, desc, hits in section['contributions']:
+                write(f"<tr><td>{escape(evaluator)}</td><td>{escape(student)}</td><td>{escape(work_type)}</td>"
+                      f"<td>{highlight_html(desc, hits)}</td></tr>\n")
+            write("</table>\n")
+
+        if section['links']:
+            write("<h3>Evidence &amp; Photos</h3>\n<ul>")
+            for evaluator, kind, url in section['links']:
+                write(f"<li>{escape(kind)} from {escape(evaluator)}: <a href=\"{escape(url)}\">{escape(url)}</a></li>")
+            write("</ul>\n")
+
+        if section['feedback']:
+            write("<h3>Feedback &amp; Reflections</h3>\n")
+            for submitter, label, text, hits in section['feedback']:
+                write(f"<p><strong>{escape(submitter)}</strong> <em>{escape(label)}:</em> {highlight_html(text, hits)}</p>\n")
+
+        write("</section>\n")
+
+    def write_missing(self, missing_submissions):
+        if not missing_submissions:
+            return
+        write = self.output.write
+        write(f"<section id=\"missing\">\n<h2>Missing Submissions ({len(missing_submissions)})</h2>\n<ul>")
+        write("".join(
+            f"<li>Period {escape(str(student['period']))}, {escape(str(student['group']))}: "
+            f"{escape(str(student['first_name']))} {escape(str(student['last_name']))}</li>"
+            for student in missing_submissions
+        ))
+        write("</ul>\n</section>\n")
+
+    def write_footer(self):
+        self.output.write("</body>\n</html>\n")
+
+def write_class_report(groups, group_financials, student_financials, bases, group_flags,
+                       variance_threshold, xlsx=None, html=None, missing_submissions=(),
+                       matcher=None, title="Bazaar Peer Review Report"):
+    """
+    Write the class report in one pass over the groups.
+    xlsx is a path or binary stream for the workbook, html a text stream for
+    the page; either may be None. bases and group_flags are the precomputed
+    analysis (see group_sections). Returns the number of groups written.
+    """
+    xlsx_writer = XlsxReportWriter() if xlsx is not None else None
+    html_writer = HtmlReportWriter(html) if html is not None else None
+
+    if html_writer is not None:
+        red_flag_groups = sum(1 for group_id in groups if group_flags[group_id][0])
+        summary = {
+            'Generated': datetime.now().strftime('%Y-%m-%d %H:%M'),
+            'Groups': len(groups),
+            'Red flag groups': red_flag_groups,
+            'Variance threshold': f"{variance_threshold}%",
+            'Missing submissions': len(missing_submissions)
+        }
+        html_writer.write_header(title, summary, [(group_id, group_flags[group_id][0]) for group_id in sorted(groups)])
+
+    count = 0
+    for section in group_sections(groups, group_financials, student_financials, bases, group_flags,
+                                  variance_threshold, matcher):
+        if xlsx_writer is not None:
+            xlsx_writer.write_section(section)
+        if html_writer is not None:
+            html_writer.write_section(section)
+        count += 1
+
+    if xlsx_writer is not None:
+        xlsx_writer.write_missing(missing_submissions)
+        xlsx_writer.save(xlsx)
+    if html_writer is not None:
+        html_writer.write_missing(missing_submissions)
+        html_writer.write_footer()
+    return count
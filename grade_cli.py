@@ -0,0 +1,164 @@
+"""
+Headless batch grading for the Bazaar Peer Review Grader.
+
+Runs the same parsing and red flag analysis as the dashboard and writes a
+machine-readable report, e.g. for a nightly job across every section:
+
+    python grade_cli.py responses.csv --roster roster.csv --financials "Period 2 Excel/" -o report.json
+    python grade_cli.py responses.csv --financials "Period 2 Excel/" --format csv -o report.csv
+    python grade_cli.py period2.csv period5.csv period6.csv --roster roster.csv --workers 4 -o class.json
+    python grade_cli.py responses.csv --roster roster.csv --financials "Period 2 Excel/" --format xlsx -o class.xlsx
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from grader_core import (
+    RED_FLAG_KEYWORDS,
+    VARIANCE_THRESHOLD_DEFAULT,
+    analyze_group_base,
+    build_flag_report,
+    flags_at_threshold,
+    get_missing_submissions,
+    get_keyword_matcher,
+    load_financial_data,
+    load_roster,
+    named_buffer,
+    parse_peer_review_data,
+    parse_peer_review_exports,
+    read_peer_review_csv,
+)
+
+FINANCIAL_EXTENSIONS = ('.xlsx', '.csv')
+
+def load_financial_dir(directory, workers=1, on_template=None):
+    """Load every {GroupID}-Income and Expense Tracking file in a directory"""
+    files = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(FINANCIAL_EXTENSIONS) or filename.startswith('~$'):
+            continue
+        with open(os.path.join(directory, filename), 'rb') as f:
+            files.append(named_buffer(filename, f.read()))
+
+    def report_error(filename, message):
+        print(f"Could not process {filename}: {message}", file=sys.stderr)
+
+    return load_financial_data(files, workers=workers, on_error=report_error, on_template=on_template)
+
+def _json_default(value):
+    """Convert NumPy scalars (e.g. roster periods) for json.dump"""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def report_to_csv(report, output):
+    """Write one row per group, with flags joined by '; '"""
+    rows = [
+        {
+            'group_id': group['group_id'],
+            'period': group['period'],
+            'status': group['status'],
+            'profit': group['profit'],
+            'max_variance': round(group['max_variance'], 1),
+            'submissions': group['submissions'],
+            'students': '; '.join(group['students']),
+            'flags': '; '.join(group['flags'])
+        }
+        for group in report['groups']
+    ]
+    columns = ['group_id', 'period', 'status', 'profit', 'max_variance', 'submissions', 'students', 'flags']
+    pd.DataFrame(rows, columns=columns).to_csv(output, index=False)
+
+def write_class_export(args, groups, group_financials, student_financials, roster, matcher):
+    """Write the full class report (see class_report.py) as an Excel workbook or HTML page"""
+    import class_report
+
+    bases = {
+        group_id: analyze_group_base(group_data, group_financials.get(group_id), student_financials.get(group_id, {}), matcher)
+        for group_id, group_data in groups.items()
+    }
+    group_flags = {group_id: flags_at_threshold(base, args.threshold) for group_id, base in bases.items()}
+    missing = get_missing_submissions(roster, groups)
+
+    if args.format == 'xlsx':
+        class_report.write_class_report(groups, group_financials, student_financials, bases, group_flags,
+                                        args.threshold, xlsx=args.output, missing_submissions=missing, matcher=matcher)
+        return
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        class_report.write_class_report(groups, group_financials, student_financials, bases, group_flags,
+                                        args.threshold, html=output, missing_submissions=missing, matcher=matcher)
+    finally:
+        if args.output:
+            output.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Write a red flag report for one class without starting Streamlit.")
+    parser.add_argument('peer_review', nargs='+',
+                        help="Google Form responses CSV (several, e.g. one per period, are merged into one class report)")
+    parser.add_argument('--roster', help="Student roster CSV (Period, Group, Student First Name, Student Last Name)")
+    parser.add_argument('--financials', help="Directory of {GroupID}-Income and Expense Tracking files")
+    parser.add_argument('--threshold', type=float, default=VARIANCE_THRESHOLD_DEFAULT,
+                        help=f"Workload variance threshold in percent (default {VARIANCE_THRESHOLD_DEFAULT})")
+    parser.add_argument('--keywords', default=", ".join(RED_FLAG_KEYWORDS),
+                        help="Comma-separated red flag keywords")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Processes used to decode financial workbooks and parse several exports (default 1)")
+    parser.add_argument('--format', choices=['json', 'csv', 'xlsx', 'html'], default='json',
+                        help="Report format (default json); xlsx and html hold the full class report")
+    parser.add_argument('-o', '--output', help="Output file (default stdout; required for xlsx)")
+    args = parser.parse_args(argv)
+    if args.format == 'xlsx' and not args.output:
+        parser.error("--format xlsx needs an output file (-o)")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    matcher = get_keyword_matcher([k for k in args.keywords.split(',') if k.strip()])
+    roster = load_roster(args.roster) if args.roster else None
+    if len(args.peer_review) == 1:
+        groups = parse_peer_review_data(read_peer_review_csv(args.peer_review[0]))
+    else:
+        payloads = []
+        for path in args.peer_review:
+            with open(path, 'rb') as f:
+                payloads.append((os.path.basename(path), f.read()))
+        groups = parse_peer_review_exports(payloads, workers=args.workers)
+
+    group_financials, student_financials = {}, {}
+    workbook_templates = {}
+    if args.financials:
+        group_financials, student_financials = load_financial_dir(
+            args.financials, workers=args.workers, on_template=workbook_templates.__setitem__
+        )
+
+    if args.format in ('xlsx', 'html'):
+        write_class_export(args, groups, group_financials, student_financials, roster, matcher)
+        return 0
+
+    report = build_flag_report(groups, group_financials, student_financials, roster, args.threshold, matcher)
+    if workbook_templates:
+        # Which Summary sheet layout each workbook matched (JSON only)
+        report['workbook_templates'] = workbook_templates
+
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        if args.format == 'csv':
+            report_to_csv(report, output)
+        else:
+            json.dump(report, output, indent=2, default=_json_default)
+            output.write('\n')
+    finally:
+        if args.output:
+            output.close()
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+"""
+Default settings for the Bazaar Peer Review Grader.
+
+Kept free of heavy imports so the dashboard can draw its sidebar and landing
+page before pandas, NumPy and grader_core are loaded.
+"""
+import os
+
+# Part of every persistent cache key; bump when cached results change shape
+APP_VERSION = '2.0.0'
+
+# Red flag keywords searched for in feedback and work descriptions
+RED_FLAG_KEYWORDS = ['lazy', 'absent', 'rude', 'nothing', 'late', 'didn\'t', 'never', 'refused']
+
+# Workload Variance Threshold slider range (%)
+VARIANCE_THRESHOLD_MIN = 5
+VARIANCE_THRESHOLD_MAX = 30
+VARIANCE_THRESHOLD_DEFAULT = 15
+VARIANCE_THRESHOLDS = list(range(VARIANCE_THRESHOLD_MIN, VARIANCE_THRESHOLD_MAX + 1))
+
+# Persistent analysis cache (set BAZAAR_CACHE_DIR to an empty string to disable)
+CACHE_DIR = os.environ.get('BAZAAR_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'bazaar_grader'))
+CACHE_MAX_MB = float(os.environ.get('BAZAAR_CACHE_MAX_MB', '512'))
+
+# Photo thumbnails are fetched and cached on the server (set BAZAAR_THUMBNAIL_PROXY=0
+# to link straight to Google Drive instead)
+THUMBNAIL_PROXY = os.environ.get('BAZAAR_THUMBNAIL_PROXY', '1') not in ('', '0')
+THUMBNAIL_CACHE_MAX_MB = float(os.environ.get('BAZAAR_THUMBNAIL_CACHE_MAX_MB', '256'))
@@ -0,0 +1,2252 @@
+"""
+Core grading logic for the Bazaar Peer Review Grader.
+
+Parsing, financial ingest and red flag analysis live here so they can be
+imported without a Streamlit runtime (see app.py for the dashboard and
+grade_cli.py for batch reports).
+"""
+import pandas as pd
+import numpy as np
+from io import BytesIO
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import copy
+import difflib
+import functools
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+import tracemalloc
+
+# Defaults live in grader_config so the dashboard can use them before this
+# module loads; they are re-exported here for callers of grader_core
+from grader_config import (  # noqa: F401
+    APP_VERSION,
+    RED_FLAG_KEYWORDS,
+    VARIANCE_THRESHOLD_DEFAULT,
+    VARIANCE_THRESHOLD_MAX,
+    VARIANCE_THRESHOLD_MIN,
+    VARIANCE_THRESHOLDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Helper Functions
+def extract_group_id(student_name):
+    """Extract group ID from student name (e.g., '2A - Watts, BriAri' -> '2A')"""
+    if pd.isna(student_name) or student_name == "":
+        return None
+    match = re.match(r'^([^-]+)', str(student_name).strip())
+    return match.group(1).strip() if match else None
+
+# Google Form columns for each group member slot. Slot 1 is the submitter
+# answering about themselves; slots 2-4 describe their teammates.
+WORK_TYPES = ['design', 'manufacturing', 'sales', 'marketing']
+
+MEMBER_SLOTS = [
+    {
+        'slot': 1,
+        'name': 'YOU - Group Member 1',
+        'percentage': 'Your percentage of work / effort',
+        'design': 'Please explain what you did regarding DESIGN work on the project. ',
+        'manufacturing': 'Please explain what you did regarding MANUFACTURING work on the project. ',
+        'sales': 'Please explain what you did regarding SALES / MANAGEMENT work on the project. ',
+        'marketing': 'Please explain what you did regarding MARKETING / ADVERTISING work on the project. '
+    }
+] + [
+    {
+        'slot': n,
+        'name': f'Group Member {n}',
+        'percentage': f'Group Member {n} percentage of work / effort',
+        'design': f'Please explain what Group Member {n} did regarding DESIGN work on the project. ',
+        'manufacturing': f'Please explain what Group Member {n} did regarding MANUFACTURING work on the project. ',
+        'sales': f'Please explain what Group Member {n} did regarding SALES / MANAGEMENT work on the project. ',
+        'marketing': f'Please explain what Group Member {n} did regarding MARKETING / ADVERTISING work on the project. '
+    }
+    for n in (2, 3, 4)
+]
+
+HAS_MEMBER4_COL = 'Did you have a 4th member of your group?'
+EVIDENCE_COL = 'Evidence to include:\n- Evidence of effort or lack thereof\n- If you followed my advice and communicated over a group chat, Snap, GChat / etc, you can submit screenshots of your communications if needed (not required but can bolster a claim)\n- Include all files related to your work, especially Adobe Illustrator files.'
+PHOTO_COL = 'Photos of your items\n- Include clear photos of each item that you either made yourself or strongly contributed to, INCLUDING your mini sheet item and your advanced item(s)'
+FEEDBACK_COLUMNS = {
+    'challenges': 'Challenges',
+    'good_stuff': 'The Good Stuff',
+    'advice': 'One (or more) pieces of solid advice'
+}
+
+# Confirmation checkboxes at the end of the form (not used by the grader)
+CONSENT_COLUMNS = [
+    "I've made absolutely sure that the group member names are correct, and that my percentage totals 100",
+    "I will be sure my submission of this form completes (sometimes you have to confirm the submission up top) and I'm aware that I will receive an email containing all of my responses to the questions above for my records and that the email is confirmation of submission."
+]
+
+def _slot_columns(slot):
+    return [slot['name'], slot['percentage']] + [slot[work_type] for work_type in WORK_TYPES]
+
+# Column order of the Google Forms export
+FORM_COLUMNS = (
+    ['Timestamp', 'Email Address']
+    + _slot_columns(MEMBER_SLOTS[0])
+    + _slot_columns(MEMBER_SLOTS[1])
+    + _slot_columns(MEMBER_SLOTS[2])
+    + [HAS_MEMBER4_COL]
+    + _slot_columns(MEMBER_SLOTS[3])
+    + [EVIDENCE_COL, PHOTO_COL]
+    + list(FEEDBACK_COLUMNS.values())
+    + CONSENT_COLUMNS
+)
+
+# Columns the grader reads; the consent checkboxes and email address are skipped on ingest
+PEER_REVIEW_COLUMNS = [column for column in FORM_COLUMNS if column not in CONSENT_COLUMNS and column != 'Email Address']
+
+# Rows per chunk when streaming a form export
+PEER_REVIEW_CHUNK_ROWS = 5000
+
+TIMESTAMP_FORMAT = '%m/%d/%Y %H:%M:%S'
+
+# Form Schema
+# Header text of each Google Form version, keyed by canonical column (the
+# current form's header). When the form is reworded, add a version here
+# instead of renaming columns in the parser.
+FORM_VERSIONS = {
+    '2025-26': {column: column for column in FORM_COLUMNS},
+}
+
+# Columns without which an export can't be parsed at all
+REQUIRED_COLUMNS = ['Timestamp', 'YOU - Group Member 1']
+
+# Minimum difflib similarity for a reworded header to count as the same question
+FUZZY_MATCH_CUTOFF = 0.85
+
+def normalize_header(text):
+    """Lowercase, straighten quotes and collapse whitespace so cosmetic edits still match"""
+    text = str(text).translate(str.maketrans({'\u2018': "'", '\u2019': "'", '\u201c': '"', '\u201d': '"'}))
+    return ' '.join(text.lower().split()).rstrip(' .:?')
+
+def _first_line(text):
+    return normalize_header(str(text).strip().split('\n')[0])
+
+def header_fingerprint(header):
+    """Stable digest of a header row, identifying exports from the same form layout"""
+    return hashlib.sha1('\x1f'.join(str(name) for name in header).encode('utf-8')).hexdigest()
+
+def resolve_form_schema(header):
+    """
+    Map each canonical column in PEER_REVIEW_COLUMNS to its position in a header row.
+    Returns dict with:
+    - fingerprint: header_fingerprint(header)
+    - version: the FORM_VERSIONS entry whose headers match best
+    - positions: {canonical column: index in header}
+    - fuzzy: {canonical column: header text} for columns matched by similarity
+    - missing: canonical columns with no match (REQUIRED_COLUMNS missing means unparseable)
+    Resolved once per distinct header; later files from the same form reuse it.
+    """
+    return _resolve_form_schema(tuple(str(name) for name in header))
+
+@functools.lru_cache(maxsize=64)
+def _resolve_form_schema(header):
+    normalized = [normalize_header(name) for name in header]
+
+    # The version sharing the most exact (normalized) headers wins
+    def exact_matches(texts):
+        return sum(normalize_header(texts[column]) in normalized for column in PEER_REVIEW_COLUMNS if column in texts)
+    version = max(FORM_VERSIONS, key=lambda name: exact_matches(FORM_VERSIONS[name]))
+    texts = FORM_VERSIONS[version]
+
+    positions = {}
+    claimed = set()
+
+    # Pass 1: exact match after normalization
+    for column in PEER_REVIEW_COLUMNS:
+        target = normalize_header(texts.get(column, column))
+        for i, name in enumerate(normalized):
+            if i not in claimed and name == target:
+                positions[column] = i
+                claimed.add(i)
+                break
+
+    # Pass 2: same first line (multi-line questions whose instructions were edited),
+    # then closest similar header. Numbers must agree so "Group Member 2" never
+    # resolves to "Group Member 3".
+    fuzzy = {}
+    for column in PEER_REVIEW_COLUMNS:
+        if column in positions:
+            continue
+        text = texts.get(column, column)
+        target = normalize_header(text)
+        digits = re.findall(r'\d+', target)
+        candidates = [i for i in range(len(header)) if i not in claimed and re.findall(r'\d+', normalized[i]) == digits]
+
+        best, best_score = None, 0.0
+        for i in candidates:
+            if '\n' in text and _first_line(header[i]) == _first_line(text):
+                best, best_score = i, 1.0
+                break
+            score = difflib.SequenceMatcher(None, target, normalized[i]).ratio()
+            if score > best_score:
+                best, best_score = i, score
+
+        if best is not None and best_score >= FUZZY_MATCH_CUTOFF:
+            positions[column] = best
+            claimed.add(best)
+            fuzzy[column] = header[best]
+
+    return {
+        'fingerprint': header_fingerprint(header),
+        'version': version,
+        'positions': positions,
+        'fuzzy': fuzzy,
+        'missing': [column for column in PEER_REVIEW_COLUMNS if column not in positions]
+    }
+
+def check_form_schema(schema):
+    """Log fuzzy and missing columns; raise ValueError when a required column is missing"""
+    for column, name in schema['fuzzy'].items():
+        logger.info("Form column %r matched header %r", column, name)
+    missing_required = [column for column in REQUIRED_COLUMNS if column in schema['missing']]
+    if missing_required:
+        raise ValueError(f"Peer review CSV is missing required column(s): {', '.join(missing_required)}")
+    if schema['missing']:
+        logger.warning("Form export has no column for: %s", "; ".join(schema['missing']))
+
+def conform_to_schema(df, schema=None):
+    """
+    Select the grader's columns from a form export by position and give them
+    their canonical names. Returns df unchanged when it already uses them.
+    """
+    # Already conformed, e.g. by read_peer_review_csv
+    canonical = set(PEER_REVIEW_COLUMNS)
+    if all(column in canonical for column in df.columns) and all(column in df.columns for column in REQUIRED_COLUMNS):
+        return df
+
+    schema = schema or resolve_form_schema(df.columns)
+    check_form_schema(schema)
+    positions = schema['positions']
+    if all(column in df.columns for column in PEER_REVIEW_COLUMNS):
+        return df
+    ordered = sorted(positions, key=positions.get)
+    conformed = df.iloc[:, [positions[column] for column in ordered]]
+    conformed.columns = ordered
+    return conformed
+
+def read_form_header(source):
+    """Read just the header row of a CSV path or file object, leaving the file where it was"""
+    if hasattr(source, 'seek'):
+        start = source.tell()
+        header = list(pd.read_csv(source, nrows=0).columns)
+        source.seek(start)
+        return header
+    return list(pd.read_csv(source, nrows=0).columns)
+
+def _column(df, name, default):
+    """Return a column of df, or a column filled with default if the form lacks it"""
+    if name in df.columns:
+        return df[name]
+    return pd.Series([default] * len(df), index=df.index, dtype=object)
+
+def extract_group_ids(names):
+    """Vectorized extract_group_id over a Series of student names"""
+    group_ids = names.astype(object).where(names.notna(), '').astype(str)
+    group_ids = group_ids.str.strip().str.extract(r'^([^-]+)', expand=False).str.strip()
+    return group_ids.where(group_ids.notna() & (group_ids != ''), None)
+
+def parse_percentages(values):
+    """Vectorized parse_percentage over a Series"""
+    cleaned = values.astype(str).str.replace('%', '', regex=False).str.strip()
+    return pd.to_numeric(cleaned, errors='coerce').fillna(0.0).where(values.notna(), 0.0).astype(float)
+
+def parse_timestamps(values):
+    """Parse Google Forms timestamps; values in another format fall back to pandas' inference"""
+    parsed = pd.to_datetime(values, format=TIMESTAMP_FORMAT, errors='coerce')
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], format='mixed', errors='coerce')
+    return parsed
+
+def _update_latest(latest, submitters, timestamps, rows):
+    """
+    Fold rows into a running {submitter: (timestamp, row)} map, keeping each
+    student's most recent submission. timestamps are int64 nanoseconds (NaT sorts
+    first); on a tie the row seen later wins. Rows without a submitter are skipped.
+    """
+    for submitter, timestamp, row in zip(submitters, timestamps, rows):
+        if not isinstance(submitter, str) or submitter == '':
+            continue
+        current = latest.get(submitter)
+        if current is None or timestamp >= current[0]:
+            latest[submitter] = (timestamp, row)
+    return latest
+
+def _newest_first(latest):
+    """Rows of a running latest-submission map, most recent first"""
+    return [row for _, row in sorted(latest.values(), key=lambda entry: entry[0], reverse=True)]
+
+def _timestamp_keys(df):
+    return parse_timestamps(_column(df, 'Timestamp', None)).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+def latest_submissions(df):
+    """
+    Keep only the most recent submission per student, newest first.
+    Timestamps are parsed once and compared in a single pass; no sort of the full export.
+    """
+    submitters = _column(df, 'YOU - Group Member 1', None).to_numpy(dtype=object)
+    latest = _update_latest({}, submitters, _timestamp_keys(df), range(len(df)))
+    return df.iloc[_newest_first(latest)]
+
+def read_peer_review_csv(source, chunksize=PEER_REVIEW_CHUNK_ROWS):
+    """
+    Stream a Google Forms export in chunks, reading only PEER_REVIEW_COLUMNS as
+    strings, and return the latest submission per student (see latest_submissions).
+    Columns are located once with resolve_form_schema and read by position, so
+    reworded form versions come back under the canonical names.
+    Only each chunk's current winners are kept, so memory stays proportional to
+    the number of students rather than the length of the export.
+    """
+    schema = resolve_form_schema(read_form_header(source))
+    check_form_schema(schema)
+    positions = schema['positions']
+    columns = sorted(positions, key=positions.get)
+
+    latest = {}
+    kept = []
+    kept_rows = 0
+    chunks = pd.read_csv(source, usecols=[positions[column] for column in columns], dtype=str, chunksize=chunksize)
+    for chunk in chunks:
+        chunk.columns = columns
+        if chunk.empty:
+            continue
+        # Row labels run on across chunks, so they identify rows globally
+        submitters = _column(chunk, 'YOU - Group Member 1', None).to_numpy(dtype=object)
+        _update_latest(latest, submitters, _timestamp_keys(chunk), chunk.index)
+        first_label = chunk.index[0]
+        winners = sorted({
+            latest[submitter][1] for submitter in set(submitters)
+            if submitter in latest and latest[submitter][1] >= first_label
+        })
+        kept.append(chunk.loc[winners])
+        kept_rows += len(winners)
+
+        # Drop rows later chunks have superseded once they outnumber the winners
+        if kept_rows > 2 * len(latest):
+            kept = [pd.concat(kept).loc[sorted(label for _, label in latest.values())]]
+            kept_rows = len(latest)
+
+    if not kept:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(kept).loc[_newest_first(latest)].reset_index(drop=True)
+
+def melt_peer_review_data(df):
+    """
+    Melt the wide Google Form export into long format.
+    Returns tuple: (submissions, evaluations)
+    - submissions: one row per deduplicated submission (submitter, group_id, timestamp,
+      evidence/photo URL strings and feedback fields)
+    - evaluations: one row per evaluator x evaluatee with the percentage and
+      work descriptions, ordered by submission and member slot
+    Only keeps the most recent submission per student (in case of duplicates).
+    """
+    # Address columns by their canonical names whatever the form version
+    df = conform_to_schema(df)
+
+    # First, deduplicate: keep only the most recent submission per student
+    df_deduped = latest_submissions(df)
+
+    submitters = _column(df_deduped, 'YOU - Group Member 1', '')
+    group_ids = extract_group_ids(submitters)
+    keep = group_ids.notna().to_numpy()
+    df_deduped = df_deduped[keep]
+    submitters = submitters[keep]
+    group_ids = group_ids[keep]
+
+    submissions = pd.DataFrame({
+        'submitter': submitters,
+        'group_id': group_ids,
+        'timestamp': _column(df_deduped, 'Timestamp', ''),
+        'evidence_urls': _column(df_deduped, EVIDENCE_COL, ''),
+        'photo_urls': _column(df_deduped, PHOTO_COL, ''),
+        **{field: _column(df_deduped, col, '') for field, col in FEEDBACK_COLUMNS.items()}
+    }).reset_index(drop=True)
+    submissions.index.name = 'submission'
+
+    # Stack every member slot into one evaluator x evaluatee table
+    has_member4 = _column(df_deduped, HAS_MEMBER4_COL, '').astype(str).str.lower().eq('yes').to_numpy()
+    slot_frames = []
+    for slot in MEMBER_SLOTS:
+        if slot['slot'] == 1:
+            evaluatees = submitters
+        else:
+            evaluatees = _column(df_deduped, slot['name'], '')
+        frame = pd.DataFrame({
+            'submission': submissions.index.to_numpy(),
+            'slot': slot['slot'],
+            'evaluatee': evaluatees.to_numpy(dtype=object),
+            'percentage': parse_percentages(_column(df_deduped, slot['percentage'], 0)).to_numpy(),
+            **{work_type: _column(df_deduped, slot[work_type], '').to_numpy(dtype=object) for work_type in WORK_TYPES}
+        })
+        if slot['slot'] > 1:
+            present = evaluatees.notna().to_numpy() & (evaluatees.astype(str) != '').to_numpy()
+            if slot['slot'] == 4:
+                present &= has_member4
+            frame = frame[present]
+        slot_frames.append(frame)
+
+    evaluations = pd.concat(slot_frames, ignore_index=True)
+    evaluations = evaluations.sort_values(['submission', 'slot'], kind='stable').reset_index(drop=True)
+    evaluations.insert(1, 'group_id', submissions['group_id'].to_numpy()[evaluations['submission'].to_numpy()])
+    evaluations.insert(2, 'evaluator', submissions['submitter'].to_numpy()[evaluations['submission'].to_numpy()])
+
+    return submissions, evaluations
+
+def _row_tuples(frame, columns):
+    """Iterate a frame's rows as plain tuples in the given column order"""
+    return zip(*(frame[column].to_numpy(dtype=object) for column in columns))
+
+# Student Names
+class StudentName:
+    """
+    One student's display forms, worked out once when the groups are built
+    instead of splitting the "GroupID - Last, First" key on every render.
+    - key: the form's "2A - Last, First" string (what groups are keyed on)
+    - short: "Last, First", as shown in the dashboard
+    - display: "First Last", as written in the financial workbooks
+    - last_name: lowercased last word of display, for loose workbook matches
+    """
+    __slots__ = ('key', 'short', 'display', 'last_name')
+
+    def __init__(self, key):
+        self.key = key
+        self.short = key.split(' - ')[1] if ' - ' in key else key
+        parts = self.short.split(', ')
+        self.display = f"{parts[1]} {parts[0]}" if len(parts) == 2 else self.short
+        words = self.display.split()
+        self.last_name = words[-1].lower() if words else None
+
+    def __repr__(self):
+        return f"StudentName({self.key!r})"
+
+def student_names(group_data):
+    """{student key: StudentName} for a group, stored at parse time or built for hand-made groups"""
+    if 'names' in group_data:
+        return group_data['names']
+    names = {student: StudentName(student) for student in group_data['students']}
+    for eval in group_data['evaluations']:
+        if eval['submitter'] not in names:
+            names[eval['submitter']] = StudentName(eval['submitter'])
+    return names
+
+def short_name(group_data, student):
+    """A student's "Last, First" form"""
+    name = student_names(group_data).get(student)
+    return name.short if name is not None else StudentName(student).short
+
+def match_student_financials(name, student_financials):
+    """
+    Find a StudentName's row in a group's workbook: exact "First Last" first,
+    then the first workbook name with the same last name. Returns the row or None.
+    """
+    if name.display in student_financials:
+        return student_financials[name.display]
+    if name.last_name is None:
+        return None
+    for fin_name, fin_info in student_financials.items():
+        fin_parts = fin_name.split()
+        if fin_parts and fin_parts[-1].lower() == name.last_name:
+            return fin_info
+    return None
+
+def build_groups(submissions, evaluations):
+    """
+    Build the nested groups dict used by the dashboard from the long tables
+    returned by melt_peer_review_data.
+    Rows are read as positional tuples rather than per-row dicts.
+    Every name string is interned, so the students set and each evaluation's
+    dicts share one object per student, and each group gets a 'names' table
+    of StudentName records.
+    """
+    groups = {}
+    feedback_fields = list(FEEDBACK_COLUMNS)
+    interned = {}
+
+    # Slice the long table into per-submission entry lists in one pass
+    entries_by_submission = {}
+    for submission_idx, member_name, percentage, *descriptions in _row_tuples(
+        evaluations, ['submission', 'evaluatee', 'percentage'] + WORK_TYPES
+    ):
+        member_name = interned.setdefault(member_name, member_name)
+        entries_by_submission.setdefault(submission_idx, []).append((member_name, percentage, descriptions))
+
+    submission_rows = _row_tuples(
+        submissions, ['group_id', 'submitter', 'timestamp', 'evidence_urls', 'photo_urls'] + feedback_fields
+    )
+    for submission_idx, (group_id, submitter_name, timestamp, evidence_urls, photo_urls, *feedback) in zip(
+        submissions.index, submission_rows
+    ):
+        submitter_name = interned.setdefault(submitter_name, submitter_name)
+
+        if group_id not in groups:
+            groups[group_id] = {
+                'students': set(),
+                'evaluations': [],
+                'feedback': []
+            }
+
+        evaluation = {
+            'submitter': submitter_name,
+            'timestamp': timestamp,
+            'percentages': {},
+            'work_descriptions': {},
+            'evidence_urls': [],
+            'photo_urls': []
+        }
+
+        for member_name, percentage, descriptions in entries_by_submission.get(submission_idx, []):
+            groups[group_id]['students'].add(member_name)
+            evaluation['percentages'][member_name] = percentage
+            evaluation['work_descriptions'][member_name] = dict(zip(WORK_TYPES, descriptions))
+
+        # Collect evidence and photo URLs (per student submission)
+        if evidence_urls and not pd.isna(evidence_urls):
+            evaluation['evidence_urls'] = parse_urls(evidence_urls)
+        if photo_urls and not pd.isna(photo_urls):
+            evaluation['photo_urls'] = parse_urls(photo_urls)
+
+        groups[group_id]['evaluations'].append(evaluation)
+
+        # Collect feedback
+        groups[group_id]['feedback'].append({
+            'submitter': submitter_name,
+            **dict(zip(feedback_fields, feedback))
+        })
+
+    for group_data in groups.values():
+        group_data['names'] = student_names(group_data)
+
+    return groups
+
+def build_rating_matrix(students, evaluators, evaluatees, percentages):
+    """
+    Build a group's dense workload rating matrix.
+    Returns dict with:
+    - students: sorted student names (row/column order)
+    - index: {student: position}
+    - values: evaluator x evaluatee float array, NaN where no rating was given
+    - submitted: bool array, True for students who submitted an evaluation
+    Later ratings of the same evaluator/evaluatee pair overwrite earlier ones.
+    """
+    students = sorted(students)
+    index = {student: i for i, student in enumerate(students)}
+    rows = np.fromiter((index[name] for name in evaluators), dtype=np.intp, count=len(evaluators))
+    cols = np.fromiter((index[name] for name in evaluatees), dtype=np.intp, count=len(evaluatees))
+
+    values = np.full((len(students), len(students)), np.nan)
+    values[rows, cols] = percentages
+    submitted = np.zeros(len(students), dtype=bool)
+    submitted[rows] = True
+
+    return {
+        'students': students,
+        'index': index,
+        'values': values,
+        'submitted': submitted
+    }
+
+def build_rating_matrices(groups, evaluations):
+    """Build the rating matrix for every group from the long evaluations table"""
+    # Keep the last rating per evaluator/evaluatee pair, like the percentages dicts
+    ratings = evaluations.drop_duplicates(subset=['submission', 'evaluatee'], keep='last')
+    matrices = {}
+    for group_id, rows in ratings.groupby('group_id', sort=False):
+        matrices[group_id] = build_rating_matrix(
+            groups[group_id]['students'],
+            rows['evaluator'].tolist(),
+            rows['evaluatee'].tolist(),
+            rows['percentage'].to_numpy(dtype=float)
+        )
+    return matrices
+
+def get_rating_matrix(group_data):
+    """Return the group's rating matrix, building it from the evaluations if it wasn't stored at parse time"""
+    if 'ratings' in group_data:
+        return group_data['ratings']
+
+    evaluators, evaluatees, percentages = [], [], []
+    for eval in group_data['evaluations']:
+        for student, pct in eval['percentages'].items():
+            evaluators.append(eval['submitter'])
+            evaluatees.append(student)
+            percentages.append(pct)
+    return build_rating_matrix(group_data['students'], evaluators, evaluatees, np.array(percentages, dtype=float))
+
+def rating_counts(ratings):
+    """Number of ratings each student received"""
+    return (~np.isnan(ratings['values'])).sum(axis=0)
+
+def rating_averages(ratings):
+    """Average percentage assigned to each student (NaN for students nobody rated)"""
+    counts = rating_counts(ratings)
+    totals = np.nansum(ratings['values'], axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+def parse_peer_review_data(df):
+    """
+    Transform wide-format peer review data into structured format.
+    Returns a dict of groups with student evaluations.
+    Only keeps the most recent submission per student (in case of duplicates).
+    Each group also carries its dense workload rating matrix under 'ratings'.
+    """
+    submissions, evaluations = melt_peer_review_data(df)
+    groups = build_groups(submissions, evaluations)
+    for group_id, ratings in build_rating_matrices(groups, evaluations).items():
+        groups[group_id]['ratings'] = ratings
+    return groups
+
+def parse_percentage(value):
+    """Convert percentage value to float"""
+    if pd.isna(value) or value == '':
+        return 0.0
+    try:
+        # Remove % sign if present
+        value_str = str(value).replace('%', '').strip()
+        return float(value_str)
+    except:
+        return 0.0
+
+def parse_urls(url_string):
+    """Extract URLs from comma-separated string"""
+    if pd.isna(url_string) or url_string == '':
+        return []
+    urls = [url.strip() for url in str(url_string).split(',')]
+    return [url for url in urls if url]
+
+# Google Drive file ID patterns: /open?id=FILE_ID and /file/d/FILE_ID
+GDRIVE_ID_PATTERN = re.compile(r'id=([a-zA-Z0-9_-]+)')
+GDRIVE_FILE_PATTERN = re.compile(r'/file/d/([a-zA-Z0-9_-]+)')
+
+def convert_gdrive_to_thumbnail(url):
+    """Convert Google Drive URL to thumbnail/viewable format"""
+    # Extract file ID from various Google Drive URL formats
+    # Pattern 1: /open?id=FILE_ID
+    match = GDRIVE_ID_PATTERN.search(url)
+    if match:
+        file_id = match.group(1)
+        return f"https://drive.google.com/thumbnail?id={file_id}&sz=w400"
+
+    # Pattern 2: /file/d/FILE_ID
+    match = GDRIVE_FILE_PATTERN.search(url)
+    if match:
+        file_id = match.group(1)
+        return f"https://drive.google.com/thumbnail?id={file_id}&sz=w400"
+
+    # Return original if no match
+    return url
+
+def split_photo_urls(urls):
+    """Split photo URLs into (image_urls, heic_urls); browsers cannot display HEIC inline"""
+    image_urls, heic_urls = [], []
+    for url in urls:
+        if 'heic' in url.lower():
+            heic_urls.append(url)
+        else:
+            image_urls.append(url)
+    return image_urls, heic_urls
+
+def group_photo_urls(group_data):
+    """Every displayable (non-HEIC) photo URL in a group, in evaluation order, without repeats"""
+    urls = {}
+    for eval in group_data['evaluations']:
+        for url in split_photo_urls(eval.get('photo_urls', []))[0]:
+            urls[url] = None
+    return list(urls)
+
+def group_link_urls(group_data):
+    """Every evidence and photo URL in a group, in evaluation order, without repeats"""
+    urls = {}
+    for eval in group_data['evaluations']:
+        for url in eval.get('evidence_urls', []) + eval.get('photo_urls', []):
+            urls[url] = None
+    return list(urls)
+
+def calculate_workload_variance(group_data):
+    """
+    Calculate workload variance for each student.
+    Returns dict of {student: variance_score}
+    """
+    ratings = get_rating_matrix(group_data)
+    values = ratings['values']
+    counts = rating_counts(ratings)
+
+    # Variance is the spread (max - min) of the percentages a student received
+    variance = np.zeros(len(ratings['students']))
+    rated = counts > 1
+    if rated.any():
+        variance[rated] = np.nanmax(values[:, rated], axis=0) - np.nanmin(values[:, rated], axis=0)
+
+    return dict(zip(ratings['students'], variance.tolist()))
+
+def check_percentage_sum(group_data):
+    """Check if percentages sum to 100 for each evaluation"""
+    ratings = get_rating_matrix(group_data)
+    totals = np.nansum(ratings['values'], axis=1)
+    bad = ratings['submitted'] & (np.abs(totals - 100) > 0.1)  # Allow small floating point errors
+    return [
+        {'submitter': ratings['students'][i], 'total': float(totals[i])}
+        for i in np.flatnonzero(bad)
+    ]
+
+HIGHLIGHT_STYLE = 'background-color: #ffcccc; padding: 2px 4px; border-radius: 3px; font-weight: bold;'
+
+class KeywordMatcher:
+    """
+    Whole-word, case-insensitive matcher for a keyword list, compiled once into
+    a single alternation so each text is scanned in one pass.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = [k.strip().lower() for k in keywords if k and k.strip()]
+        # Longest first so overlapping keywords prefer the longer match
+        alternation = '|'.join(re.escape(k) for k in sorted(set(self.keywords), key=len, reverse=True))
+        self.pattern = re.compile(r'(?<!\w)(?:' + alternation + r')(?!\w)', re.IGNORECASE) if alternation else None
+
+    def find(self, text):
+        """Return all hits as (start, end, keyword) tuples, in text order"""
+        if self.pattern is None or pd.isna(text) or text == '':
+            return []
+        return [(m.start(), m.end(), m.group(0).lower()) for m in self.pattern.finditer(str(text))]
+
+    def keywords_in(self, text):
+        """Return the distinct keywords found in text, in lexicon order"""
+        found = {keyword for _, _, keyword in self.find(text)}
+        return [keyword for keyword in dict.fromkeys(self.keywords) if keyword in found]
+
+    def highlight(self, text):
+        """Wrap every hit in a highlighted HTML span"""
+        return highlight_spans(text, self.find(text))
+
+@functools.lru_cache(maxsize=16)
+def _compile_keyword_matcher(keywords):
+    return KeywordMatcher(keywords)
+
+def get_keyword_matcher(keywords=None):
+    """Return the compiled matcher for a keyword list (defaults to RED_FLAG_KEYWORDS)"""
+    return _compile_keyword_matcher(tuple(keywords if keywords is not None else RED_FLAG_KEYWORDS))
+
+def highlight_spans(text, hits):
+    """Wrap precomputed (start, end, keyword) hits in highlighted HTML spans"""
+    if pd.isna(text) or text == '':
+        return text
+    text = str(text)
+    parts = []
+    last = 0
+    for start, end, _ in hits:
+        parts.append(text[last:start])
+        parts.append(f'<span style="{HIGHLIGHT_STYLE}">{text[start:end]}</span>')
+        last = end
+    parts.append(text[last:])
+    return ''.join(parts)
+
+def hit_keywords(hits):
+    """Distinct keywords in a hit list, in order of appearance"""
+    return list(dict.fromkeys(keyword for _, _, keyword in hits))
+
+def index_keyword_hits(groups, matcher=None):
+    """
+    Attach keyword hit spans to every evaluation and feedback record (in place).
+    - evaluation['keyword_hits']: {student: {work_type: [(start, end, keyword)]}}
+    - feedback['keyword_hits']: {field: [(start, end, keyword)]}
+    Only texts with hits get an entry (most have none), so the index stays
+    small for a whole school; work_description_hits/feedback_hits default to [].
+    Flagging and highlighting then read these spans instead of rescanning text.
+    """
+    matcher = matcher or get_keyword_matcher()
+    for group_data in groups.values():
+        for eval in group_data['evaluations']:
+            eval_hits = {}
+            for student, descriptions in eval['work_descriptions'].items():
+                student_hits = {}
+                for work_type, desc in descriptions.items():
+                    hits = matcher.find(desc)
+                    if hits:
+                        student_hits[work_type] = hits
+                if student_hits:
+                    eval_hits[student] = student_hits
+            eval['keyword_hits'] = eval_hits
+        for feedback in group_data['feedback']:
+            field_hits = {}
+            for field in FEEDBACK_COLUMNS:
+                hits = matcher.find(feedback.get(field, ''))
+                if hits:
+                    field_hits[field] = hits
+            feedback['keyword_hits'] = field_hits
+    return groups
+
+def feedback_hits(feedback, field, matcher=None):
+    """Keyword hits for a feedback field, from the span index when present"""
+    if 'keyword_hits' in feedback:
+        return feedback['keyword_hits'].get(field, [])
+    return (matcher or get_keyword_matcher()).find(feedback.get(field, ''))
+
+def work_description_hits(eval, student, work_type, matcher=None):
+    """Keyword hits for one work description, from the span index when present"""
+    if 'keyword_hits' in eval:
+        return eval['keyword_hits'].get(student, {}).get(work_type, [])
+    return (matcher or get_keyword_matcher()).find(eval['work_descriptions'][student][work_type])
+
+def detect_red_flag_keywords(text, matcher=None):
+    """Check for red flag keywords in feedback"""
+    return (matcher or get_keyword_matcher()).keywords_in(text)
+
+def highlight_keywords(text, matcher=None):
+    """Highlight red flag keywords in text with red background"""
+    return (matcher or get_keyword_matcher()).highlight(text)
+
+def check_low_sales(group_data, student_financials):
+    """
+    Check if any student has significantly lower sales than groupmates.
+    Returns list of (student_name, income, avg_income) tuples for low performers.
+    """
+    if not student_financials:
+        return []
+
+    names = student_names(group_data)
+
+    # Collect income data for all students in the group
+    incomes = []
+    student_income_map = {}
+
+    for student in group_data['students']:
+        # Match "GroupID - Last, First" to the workbook's "First Last"
+        name = names[student]
+        student_fin = match_student_financials(name, student_financials)
+        if student_fin is not None:
+            income = student_fin['income']
+            incomes.append(income)
+            student_income_map[name.short] = income
+
+    if len(incomes) < 2:
+        # Need at least 2 students to compare
+        return []
+
+    # Calculate average income
+    avg_income = sum(incomes) / len(incomes)
+
+    # Flag students with income < 50% of average (and average is meaningful)
+    low_sellers = []
+    if avg_income > 10:  # Only flag if average is at least $10
+        for student_short, income in student_income_map.items():
+            if income < avg_income * 0.5:  # Less than 50% of average
+                low_sellers.append((student_short, income, avg_income))
+
+    return low_sellers
+
+def analyze_group_base(group_data, financial_profit, student_financials=None, matcher=None):
+    """
+    Run every red flag check that doesn't depend on the variance threshold.
+    Returns dict with variance_scores, max_variance and flags (all reasons
+    except the workload variance one, which flags_at_threshold adds).
+    matcher is the KeywordMatcher for the red flag lexicon (defaults to RED_FLAG_KEYWORDS).
+    """
+    flags = []
+
+    # Workload variance (compared against the threshold later)
+    variance_scores = calculate_workload_variance(group_data)
+    max_variance = max(variance_scores.values()) if variance_scores else 0
+
+    # Check for students not pulling their weight (below fair share)
+    num_students = len(group_data['students'])
+    expected_pct = 100.0 / num_students
+    threshold_pct = expected_pct * 0.6  # Flag if below 60% of fair share
+
+    # Average percentage assigned to each student
+    ratings = get_rating_matrix(group_data)
+    averages = rating_averages(ratings)
+    low = ~np.isnan(averages) & (averages < threshold_pct)
+
+    names = student_names(group_data)
+    low_contributors = []
+    for i in np.flatnonzero(low):
+        student = ratings['students'][i]
+        low_contributors.append((names[student].short, float(averages[i]), expected_pct))
+
+    if low_contributors:
+        for student_name, avg_pct, expected in low_contributors:
+            flags.append(f"Low workload: {student_name} ({avg_pct:.1f}% vs expected {expected:.1f}%)")
+
+    # Check financial profit
+    if financial_profit is not None and financial_profit < 0:
+        flags.append(f"Negative profit (${financial_profit:.2f})")
+
+    # Check for low sales compared to group (if we have student financial data)
+    if student_financials:
+        low_sellers = check_low_sales(group_data, student_financials)
+        if low_sellers:
+            for student_name, income, avg_income in low_sellers:
+                flags.append(f"Low sales: {student_name} (${income:.2f} vs avg ${avg_income:.2f})")
+
+    # Check for keyword red flags in feedback
+    keyword_flags = []
+    for feedback in group_data['feedback']:
+        for field in ['challenges', 'good_stuff', 'advice']:
+            keywords = hit_keywords(feedback_hits(feedback, field, matcher))
+            if keywords:
+                keyword_flags.extend(keywords)
+
+    # Check in work descriptions
+    for eval in group_data['evaluations']:
+        for student, descriptions in eval['work_descriptions'].items():
+            for work_type in descriptions:
+                keywords = hit_keywords(work_description_hits(eval, student, work_type, matcher))
+                if keywords:
+                    keyword_flags.extend(keywords)
+
+    if keyword_flags:
+        unique_keywords = list(dict.fromkeys(keyword_flags))
+        flags.append(f"Red flag keywords: {', '.join(unique_keywords)}")
+
+    # Check percentage sum issues
+    pct_issues = check_percentage_sum(group_data)
+    if pct_issues:
+        flags.append(f"Percentage sum errors ({len(pct_issues)} submissions)")
+
+    return {
+        'variance_scores': variance_scores,
+        'max_variance': max_variance,
+        'flags': flags
+    }
+
+def flags_at_threshold(base, variance_threshold):
+    """Return (is_red_flag, flags) for a base analysis at one variance threshold"""
+    flags = list(base['flags'])
+    if base['max_variance'] > variance_threshold:
+        flags.insert(0, f"High workload variance ({base['max_variance']:.1f}%)")
+    return len(flags) > 0, flags
+
+def analyze_group_flags(group_data, financial_profit, variance_threshold, student_financials=None, matcher=None):
+    """
+    Analyze group and return red flag status and reasons.
+    matcher is the KeywordMatcher for the red flag lexicon (defaults to RED_FLAG_KEYWORDS).
+    """
+    base = analyze_group_base(group_data, financial_profit, student_financials, matcher)
+    is_red_flag, flags = flags_at_threshold(base, variance_threshold)
+    return is_red_flag, flags, base['variance_scores']
+
+def sweep_group_flags(bases, thresholds, previous=None, changed=()):
+    """
+    Precompute every group's flag outcome at every variance threshold.
+    bases: {group_id: analyze_group_base result}
+    With a previous sweep over the same thresholds, the flag lists of groups
+    not in changed are reused from it (see update_group_bases).
+    Returns dict with:
+    - thresholds: list of thresholds swept
+    - group_ids: row order of red
+    - red: groups x thresholds bool array of red flag status
+    - flags: {group_id: {threshold: flags}}
+    """
+    thresholds = [int(t) for t in thresholds]
+    group_ids = list(bases)
+
+    max_variance = np.array([bases[g]['max_variance'] for g in group_ids], dtype=float).reshape(-1, 1)
+    has_other_flags = np.array([bool(bases[g]['flags']) for g in group_ids], dtype=bool).reshape(-1, 1)
+    high_variance = max_variance > np.array(thresholds, dtype=float).reshape(1, -1)
+    red = high_variance | has_other_flags
+
+    reusable = previous['flags'] if previous is not None and previous['thresholds'] == thresholds else {}
+    flags = {}
+    for i, group_id in enumerate(group_ids):
+        if group_id in reusable and group_id not in changed:
+            flags[group_id] = reusable[group_id]
+            continue
+        base = bases[group_id]
+        variance_flag = [f"High workload variance ({base['max_variance']:.1f}%)"]
+        flags[group_id] = {
+            t: (variance_flag + base['flags']) if high_variance[i, k] else base['flags']
+            for k, t in enumerate(thresholds)
+        }
+
+    return {
+        'thresholds': thresholds,
+        'group_ids': group_ids,
+        'red': red,
+        'flags': flags
+    }
+
+def lookup_group_flags(sweep, group_id, variance_threshold):
+    """Return (is_red_flag, flags) for a group from a precomputed sweep"""
+    flags = sweep['flags'][group_id][int(variance_threshold)]
+    return len(flags) > 0, flags
+
+def flagged_counts(sweep):
+    """Number of red flag groups at each swept threshold"""
+    return sweep['red'].sum(axis=0)
+
+# Roster CSV columns and the student info keys they become
+ROSTER_COLUMNS = {
+    'Student First Name': 'first_name',
+    'Student Last Name': 'last_name',
+    'Group': 'group',
+    'Period': 'period'
+}
+
+def load_roster(roster_file):
+    """
+    Load student roster from CSV.
+    Returns dict with group info and list of all students:
+    - frame: DataFrame of first_name, last_name, group, period indexed by the
+      student's peer review name ("GroupID - Last, First"), in roster order
+    - students: list of student info dicts (name plus the frame's columns), in roster order
+    - groups / periods: {group or period: [student info]}
+    """
+    if roster_file is None:
+        return None
+
+    df = pd.read_csv(roster_file)
+    frame = df[list(ROSTER_COLUMNS)].rename(columns=ROSTER_COLUMNS)
+    columns = {key: frame[key].tolist() for key in frame.columns}
+
+    # Format student name to match peer review format
+    names = [
+        f"{group} - {last_name}, {first_name}"
+        for group, last_name, first_name in zip(columns['group'], columns['last_name'], columns['first_name'])
+    ]
+    frame.index = pd.Index(names, dtype=object, name='name')
+
+    students = [
+        dict(zip(('name',) + tuple(columns), values))
+        for values in zip(names, *columns.values())
+    ]
+    roster = {
+        'frame': frame,
+        'students': students,
+        'groups': {},
+        'periods': {}
+    }
+    for student_info in students:
+        roster['groups'].setdefault(student_info['group'], []).append(student_info)
+        roster['periods'].setdefault(student_info['period'], []).append(student_info)
+
+    return roster
+
+def get_missing_submissions(roster, groups):
+    """
+    Find students who haven't submitted peer reviews: an anti-join of the
+    roster frame's names against the (deduplicated) submitters.
+    Returns list of student info dicts, in roster order.
+    """
+    if roster is None:
+        return []
+
+    # Submissions are deduplicated per student at parse time, and isin hashes them once
+    submitted_students = [eval['submitter'] for group_data in groups.values() for eval in group_data['evaluations']]
+    missing = ~roster['frame'].index.isin(submitted_students)
+    return [roster['students'][i] for i in np.flatnonzero(missing)]
+
+def missing_by_period(missing_submissions):
+    """{period: {group: [student info]}} of missing students, periods and groups sorted, students in roster order"""
+    by_period = {}
+    for student_info in missing_submissions:
+        by_period.setdefault(student_info['period'], {}).setdefault(student_info['group'], []).append(student_info)
+    return {
+        period: {group: by_period[period][group] for group in sorted(by_period[period], key=_roster_sort_key)}
+        for period in sorted(by_period, key=_roster_sort_key)
+    }
+
+def _roster_sort_key(value):
+    """Sort key for roster cells: numbers in order, then text, then blank (NaN) cells last"""
+    if pd.isna(value):
+        return (2, 0, '')
+    if isinstance(value, (int, float, np.number)):
+        return (0, value, '')
+    return (1, 0, str(value))
+
+def extract_student_financials(uploaded_file):
+    """
+    Extract per-student financial data from Summary sheet.
+    Returns dict of {student_name: {income, expenses, profit, inventory}}
+    Student names in Excel are "First Last" format.
+    """
+    try:
+        df = pd.read_excel(uploaded_file, sheet_name='Summary')
+    except:
+        return {}
+    return student_financials_from_summary(df)
+
+def student_financials_from_summary(df):
+    """
+    Extract per-student financial data from an already loaded Summary sheet.
+    Returns dict of {student_name: {income, expenses, profit, inventory}}
+    """
+    # Look for header row with "Group Member" in the first column
+    cells, labels = locate_summary_labels(df)
+    header_row = member_header_row(labels)
+    if header_row is None:
+        return {}
+    return _student_financials_below(cells, header_row)
+
+def parse_currency(value):
+    """Convert a cell (number, or text like "$1,200") to float, 0 when it doesn't parse"""
+    if pd.isna(value):
+        return 0
+    if isinstance(value, (int, float)):
+        return float(value)
+    # Remove $ and convert
+    value_str = str(value).replace('$', '').replace(',', '').strip()
+    try:
+        return float(value_str)
+    except ValueError:
+        return 0
+
+def _student_financials_below(cells, header_row):
+    """Read the per-student table under the "Group Member" header row of a sheet's cell array"""
+    student_financials = {}
+    width = cells.shape[1]
+
+    # Student data starts right after header row
+    for row in cells[header_row + 1:]:
+        # Check if first column looks like a student name
+        if pd.isna(row[0]):
+            continue
+        student_name = str(row[0]).strip()
+
+        if student_name == '' or student_name == 'nan':
+            continue
+
+        # Skip summary/total rows
+        if any(keyword in student_name.lower() for keyword in ['total', 'summary', 'grand']):
+            continue
+
+        try:
+            # Extract financial data
+            # Handle both numeric and string values (with $ signs)
+            income = parse_currency(row[1]) if width > 1 else 0
+            expenses = parse_currency(row[2]) if width > 2 else 0
+            profit = parse_currency(row[3]) if width > 3 else 0
+            inventory = parse_currency(row[4]) if width > 4 else 0
+        except Exception:
+            continue
+
+        # Store with "First Last" format
+        student_financials[student_name] = {
+            'income': income,
+            'expenses': expenses,
+            'profit': profit,
+            'inventory': inventory
+        }
+
+    return student_financials
+
+def load_financial_file(uploaded_file):
+    """
+    Load one financial Excel/CSV file.
+    Returns tuple: (group_id, profit, student_financials, template), or None if the file is skipped.
+    student_financials is None when the file has no readable Summary sheet;
+    template (see read_sheet_financials) is None for CSV files.
+    """
+    filename = uploaded_file.name
+
+    # Extract group ID from filename (e.g., "2A-Income and Expense Tracking.xlsx" -> "2A")
+    match = re.match(r'^([^-]+)', filename)
+    if not match:
+        return None
+
+    group_id = match.group(1).strip()
+    students = None
+
+    if filename.endswith('.xlsx'):
+        profit, students, template = load_workbook_financials(uploaded_file)
+        return group_id, profit, students, template
+    elif filename.endswith('.csv'):
+        df = pd.read_csv(uploaded_file)
+    else:
+        return None
+
+    # Look for profit calculation
+    profit = calculate_profit_from_financial_file(df)
+    return group_id, profit, students, None
+
+def read_sheet_frame(rows):
+    """
+    Build the DataFrame pd.read_excel would return from streamed worksheet rows.
+    The first row is the header; columns are positional since the parsers below
+    only address cells by position.
+    """
+    data = []
+    for row in rows:
+        cells = list(row)
+        # Trim trailing empty cells like pandas' openpyxl reader does
+        while cells and cells[-1] in (None, ''):
+            cells.pop()
+        data.append([np.nan if value is None or value == '' else value for value in cells])
+
+    # Drop trailing empty rows
+    while data and not data[-1]:
+        data.pop()
+
+    if not data:
+        return pd.DataFrame()
+
+    width = max(len(cells) for cells in data)
+    body = [cells + [np.nan] * (width - len(cells)) for cells in data[1:]]
+    return pd.DataFrame(body, columns=range(width))
+
+def load_workbook_financials(uploaded_file):
+    """
+    Open an Excel workbook once in read-only mode and extract both the group
+    profit and the per-student financials from the streamed Summary sheet.
+    Returns tuple: (profit, student_financials, template)
+    Falls back to the first sheet (profit only, student_financials None) when
+    there is no Summary sheet. template reports the layout the sheet matched
+    (see read_sheet_financials).
+    """
+    # openpyxl is only needed once Excel files arrive, so it loads on first use
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        sheet = workbook['Summary'] if 'Summary' in workbook.sheetnames else workbook.worksheets[0]
+        df = read_sheet_frame(sheet.iter_rows(values_only=True))
+        sheetnames = workbook.sheetnames
+    finally:
+        workbook.close()
+
+    return read_sheet_financials(sheetnames, sheet.title, df)
+
+def file_sha256(uploaded_file):
+    """Return the SHA-256 hex digest of an uploaded file's contents"""
+    return hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+
+def named_buffer(name, data):
+    """Wrap raw bytes in a file-like object that carries the upload's filename"""
+    buffer = BytesIO(data)
+    buffer.name = name
+    return buffer
+
+_MISSING = object()
+
+class ContentCache:
+    """
+    Bounded least-recently-used store keyed on content hashes.
+    Used for financial files, where load_financial_data needs to know which
+    uploads are cache misses before handing them to the process pool.
+    With a backing store (e.g. DiskCache), misses fall through to it and puts
+    are written through, so entries outlive the process.
+    """
+
+    def __init__(self, max_entries, backing=None):
+        self.max_entries = max_entries
+        self.backing = backing
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                # Hand out copies so callers can't mutate the cached value
+                return copy.deepcopy(self._entries[key])
+        if self.backing is None:
+            return default
+        value = self.backing.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.backing is not None:
+            self.backing.put(key, value)
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = copy.deepcopy(value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+def cache_version():
+    """
+    Version tag for persistent cache entries: APP_VERSION plus a digest of this
+    module, so results computed by older parsing code are never served.
+    """
+    with open(__file__, 'rb') as f:
+        return f"{APP_VERSION}+{hashlib.sha256(f.read()).hexdigest()[:12]}"
+
+class DiskCache:
+    """
+    Persistent least-recently-used store in a SQLite file, shared by every
+    session and surviving restarts. Same get/put interface as ContentCache.
+    Keys are any repr-able value (e.g. ('groups', sha256)) and are stored
+    together with a version tag; entries from other versions are dropped on
+    open. Values are pickled, so only point it at a directory the app owns.
+    Once the stored values exceed max_bytes, the least recently read go first.
+    filename selects a separate store in the same directory (see thumbnails.py).
+    """
+
+    FILENAME = 'analysis_cache.sqlite3'
+
+    def __init__(self, directory, max_bytes, version=None, filename=None):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, filename or self.FILENAME)
+        self.max_bytes = max_bytes
+        self.version = version or cache_version()
+        self._lock = threading.Lock()
+        with self._connect() as db, db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, version TEXT, value BLOB, size INTEGER, accessed REAL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            db.execute("DELETE FROM entries WHERE version != ?", (self.version,))
+
+    def _connect(self):
+        # One short-lived connection per call keeps this safe across Streamlit's session threads
+        return contextlib.closing(sqlite3.connect(self.path, timeout=30))
+
+    def _key(self, key):
+        return hashlib.sha256(repr((self.version, key)).encode('utf-8')).hexdigest()
+
+    def get(self, key, default=None):
+        digest = self._key(key)
+        try:
+            with self._lock, self._connect() as db, db:
+                row = db.execute("SELECT value FROM entries WHERE key = ?", (digest,)).fetchone()
+                if row is None:
+                    return default
+                db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), digest))
+            return pickle.loads(row[0])
+        except (sqlite3.Error, pickle.UnpicklingError, EOFError, AttributeError) as e:
+            logger.warning("Analysis cache read failed: %s", e)
+            return default
+
+    def put(self, key, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        try:
+            with self._lock, self._connect() as db, db:
+                db.execute(
+                    "INSERT OR REPLACE INTO entries (key, version, value, size, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (self._key(key), self.version, data, len(data), time.time())
+                )
+                self._evict(db)
+        except sqlite3.Error as e:
+            logger.warning("Analysis cache write failed: %s", e)
+
+    def _evict(self, db):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for digest, size in db.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            db.execute("DELETE FROM entries WHERE key = ?", (digest,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def size_bytes(self):
+        with self._connect() as db:
+            return db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def clear(self):
+        with self._lock, self._connect() as db, db:
+            db.execute("DELETE FROM entries")
+
+    def __len__(self):
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+def process_pool_context():
+    """
+    Start method for worker pools: the dashboard server is multithreaded
+    (thumbnail and link-check pools, SQLite connections), so it must never be
+    forked. forkserver where the platform has it, else spawn.
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+def _timed_load_financial_file(uploaded_file):
+    """
+    Load one financial file, timing the decode.
+    Returns tuple: (result, error_message, seconds)
+    """
+    start = time.perf_counter()
+    try:
+        return load_financial_file(uploaded_file), None, time.perf_counter() - start
+    except Exception as e:
+        return None, str(e), time.perf_counter() - start
+
+def _load_financial_worker(filename, data):
+    """Process pool entry point: load one financial file from its raw bytes"""
+    return _timed_load_financial_file(named_buffer(filename, data))
+
+def load_financial_files_parallel(named_payloads, workers):
+    """
+    Load (filename, bytes) pairs across a pool of worker processes, each
+    starting with the workbook templates learned so far.
+    Returns a list of (result, error_message, seconds) tuples in input order.
+    """
+    outcomes = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=process_pool_context(),
+                             initializer=_seed_summary_templates,
+                             initargs=(SUMMARY_TEMPLATES.snapshot(),)) as pool:
+        futures = [pool.submit(_load_financial_worker, filename, data) for filename, data in named_payloads]
+        for future in futures:
+            try:
+                outcomes.append(future.result())
+            except Exception as e:
+                outcomes.append((None, str(e), 0.0))
+    return outcomes
+
+def _log_financial_error(filename, message):
+    logger.warning("Could not process %s: %s", filename, message)
+
+def load_financial_data(uploaded_files, cache=None, workers=1, on_error=None, profiler=None, on_template=None):
+    """
+    Load financial data from uploaded Excel/CSV files.
+    Returns tuple: (group_financials, student_financials)
+    - group_financials: dict of {group_id: profit_value}
+    - student_financials: dict of {group_id: {student_name: {income, expenses, profit, inventory}}}
+    With a ContentCache, unchanged files (same filename and SHA-256) are served from it.
+    With workers > 1, files that still need decoding are spread across a process pool.
+    Results are merged in upload order either way.
+    Files that fail to load are reported through on_error(filename, message),
+    or logged as warnings when no callback is given.
+    With a StageProfiler, each file's decode time (or cache hit) is recorded.
+    on_template(filename, template) is called with the layout each workbook
+    matched ({'id', 'sheet', 'profit_cell', 'known'}, see read_sheet_financials),
+    including workbooks served from the cache; known is True when an earlier
+    file of this upload had the same layout. Layouts found by pool workers or
+    stored in the cache are learned into SUMMARY_TEMPLATES.
+    """
+    on_error = on_error or _log_financial_error
+    group_financials = {}
+    student_financials = {}
+
+    outcomes = {}
+    keys = {}
+    pending = []
+
+    for idx, uploaded_file in enumerate(uploaded_files):
+        if cache is not None:
+            keys[idx] = (uploaded_file.name, file_sha256(uploaded_file))
+            cached = cache.get(keys[idx], _MISSING)
+            if cached is not _MISSING:
+                outcomes[idx] = (cached, None)
+                if profiler is not None:
+                    profiler.record_file(uploaded_file.name, 0.0, 'cache')
+                continue
+        pending.append(idx)
+
+    if workers > 1 and len(pending) > 1:
+        payloads = [(uploaded_files[idx].name, uploaded_files[idx].getvalue()) for idx in pending]
+        loaded = load_financial_files_parallel(payloads, workers)
+        source = 'worker'
+    else:
+        loaded = [_timed_load_financial_file(uploaded_files[idx]) for idx in pending]
+        source = 'decoded'
+
+    for idx, (result, error, seconds) in zip(pending, loaded):
+        outcomes[idx] = (result, error)
+        if cache is not None and error is None:
+            cache.put(keys[idx], result)
+        if profiler is not None:
+            profiler.record_file(uploaded_files[idx].name, seconds, source if error is None else 'error')
+
+    seen_layouts = set()
+    for idx, uploaded_file in enumerate(uploaded_files):
+        result, error = outcomes[idx]
+        if error is not None:
+            on_error(uploaded_file.name, error)
+            continue
+
+        if result is None:
+            continue
+
+        group_id, profit, students, template = result
+        if template is not None:
+            layout = template['layout']
+            if layout is not None and SUMMARY_TEMPLATES.get(layout['key']) is None:
+                SUMMARY_TEMPLATES.learn(layout)
+            if on_template is not None:
+                on_template(uploaded_file.name, {
+                    'id': template['id'],
+                    'sheet': template['sheet'],
+                    'profit_cell': template['profit_cell'],
+                    'known': template['id'] in seen_layouts
+                })
+            seen_layouts.add(template['id'])
+        if students is not None:
+            student_financials[group_id] = students
+        group_financials[group_id] = profit
+
+    return group_financials, student_financials
+
+# Any cell calculate_profit_from_financial_file might treat as a label, or
+# the "Group Member" header of the per-student table, contains one of these
+# (matched against lowercased cell text)
+SUMMARY_LABEL_PATTERN = re.compile(r'profit|net|total income|total expense|group member')
+MEMBER_HEADER_LABEL = 'group member'
+
+def locate_summary_labels(df):
+    """
+    Find every candidate label in a sheet in one pass over its cells.
+    Returns (cells, labels): cells is the frame as an object array, labels is
+    [(row, col, lowercased text)] in row-major order. Only text cells can hold
+    a label, so numbers and dates are never converted to strings.
+    """
+    cells = df.to_numpy(dtype=object)
+    return cells, _label_cells(cells)
+
+def _label_cells(cells):
+    """[(row, col, lowercased text)] of the label cells in a 2-D object array, row-major"""
+    if cells.size == 0:
+        return []
+    width = cells.shape[1]
+    labels = []
+    for i, value in enumerate(cells.ravel()):
+        if isinstance(value, str):
+            text = value.lower()
+            if SUMMARY_LABEL_PATTERN.search(text):
+                labels.append((i // width, i % width, text))
+    return labels
+
+def member_header_row(labels):
+    """Row of the first "Group Member" cell in the first column, or None"""
+    for row, col, text in labels:
+        if col == 0 and MEMBER_HEADER_LABEL in text:
+            return row
+    return None
+
+def _to_float(value):
+    """float(value), or None when it doesn't convert"""
+    try:
+        return float(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+def profit_from_labels(cells, labels):
+    """
+    Apply calculate_profit_from_financial_file's strategies to located labels.
+    Returns (profit, value_cell): value_cell is the (row, col) the profit was
+    read from when it came from the first "Total Profit" label (the template's
+    layout), else None.
+    """
+    width = cells.shape[1] if cells.ndim == 2 else 0
+
+    # Strategy 1: Look for "Total Profit" in any column, value in the next column
+    first = True
+    for row, col, text in labels:
+        if 'total profit' in text and col + 1 < width:
+            value = _to_float(cells[row, col + 1])
+            if value is not None:
+                return value, ((row, col + 1) if first else None)
+            first = False
+
+    # Strategy 2: Look for any cell containing "profit" and "total" in the first column
+    if width > 1:
+        for row, col, text in labels:
+            if col == 0 and 'profit' in text and 'total' in text:
+                value = _to_float(cells[row, 1])
+                if value is not None:
+                    return value, None
+
+    # Strategy 3: Look for "Total Income" and "Total Expenses" to calculate (last match wins)
+    total_income = None
+    total_expenses = None
+
+    for row, col, text in labels:
+        if col + 1 >= width:
+            continue
+        if 'total income' in text:
+            value = _to_float(cells[row, col + 1])
+            if value is not None:
+                total_income = value
+        if 'total expense' in text:
+            value = _to_float(cells[row, col + 1])
+            if value is not None:
+                total_expenses = value
+
+    if total_income is not None and total_expenses is not None:
+        return total_income - total_expenses, None
+
+    # Strategy 4: Generic fallback - any "profit"/"net" label, first numeric value from it rightwards
+    for row, col, text in labels:
+        if 'profit' in text or 'net' in text:
+            for check_col in range(col, width):
+                value = cells[row, check_col]
+                if pd.notna(value):
+                    value = _to_float(value)
+                    if value is not None:
+                        return value, None
+
+    return None, None
+
+def calculate_profit_from_financial_file(df):
+    """
+    Calculate profit from financial spreadsheet.
+    Expects Summary sheet with structure:
+    - Row with "Total Profit" label in first column
+    - Profit value in second column
+    The sheet is scanned once (locate_summary_labels); the strategies in
+    profit_from_labels then only visit the located label cells, in row-major order.
+    """
+    return profit_from_labels(*locate_summary_labels(df))[0]
+
+# Workbook Templates
+# Nearly every group fills in the same Income and Expense Tracking template.
+# The first workbook of a layout goes through the label search, and the labels
+# in the rows down to its profit cell and "Group Member" header are remembered
+# under the workbook's sheet names. Later workbooks with those sheet names only
+# check those rows; when their labels match, the profit cell and member table
+# are read directly and the rest of the sheet is never searched.
+SUMMARY_TEMPLATE_MAX = 64
+
+def summary_layout_key(sheetnames, sheet_name):
+    """Templates are looked up by the workbook's sheet names and the sheet read"""
+    return (tuple(sheetnames), sheet_name)
+
+def summary_fingerprint(key, skeleton):
+    """Template ID: the layout key and the (row, col, text) labels of its header rows"""
+    return hashlib.sha1(repr((key, skeleton)).encode('utf-8')).hexdigest()[:10]
+
+def cell_reference(row, col):
+    """Spreadsheet reference ("B3") of a cell in a frame from read_sheet_frame (its first row is the header)"""
+    letters = ''
+    col += 1
+    while col:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return f"{letters}{row + 2}"
+
+class SummaryTemplates:
+    """
+    Learned sheet layouts: {layout key: {'key', 'id', 'rows', 'labels',
+    'profit_cell', 'member_row'}}, least recently used dropped past
+    max_entries. load_financial_data seeds pool workers with a snapshot and
+    learns the layouts they report back, so templates outlive each pool.
+    """
+
+    def __init__(self, max_entries=SUMMARY_TEMPLATE_MAX):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def learn(self, layout):
+        with self._lock:
+            self._entries[layout['key']] = layout
+            self._entries.move_to_end(layout['key'])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+SUMMARY_TEMPLATES = SummaryTemplates()
+
+def _seed_summary_templates(layouts):
+    """Process pool initializer: start each worker with the parent's learned layouts"""
+    for layout in layouts:
+        SUMMARY_TEMPLATES.learn(layout)
+
+def _read_known_layout(cells, layout):
+    """
+    (profit, member_row) read at a learned layout's cells, or None when the
+    sheet's header rows don't carry exactly the learned labels or the profit
+    cell holds no number. A match gives what the label search would: every
+    label up to the profit and member header is where the search found them.
+    """
+    row, col = layout['profit_cell']
+    if cells.ndim != 2 or row >= cells.shape[0] or col >= cells.shape[1]:
+        return None
+    if _label_cells(cells[:layout['rows']]) != layout['labels']:
+        return None
+    member_row = layout['member_row']
+    # Without a member table, no "Group Member" header may appear further down either
+    if member_row is None and member_header_row(_label_cells(cells[:, :1])) is not None:
+        return None
+    profit = _to_float(cells[row, col])
+    if profit is None:
+        return None
+    return profit, member_row
+
+def _search_layout(cells, key):
+    """
+    Label search over the whole sheet.
+    Returns tuple: (profit, member_row, template_id, layout) where layout is
+    the template to learn, or None when the profit didn't come from the first
+    "Total Profit" label above the member table.
+    """
+    labels = _label_cells(cells)
+    member_row = member_header_row(labels)
+    profit, profit_cell = profit_from_labels(cells, labels)
+
+    if profit_cell is not None and (member_row is None or profit_cell[0] <= member_row):
+        rows = max(profit_cell[0], -1 if member_row is None else member_row) + 1
+    else:
+        profit_cell = None
+        rows = len(cells) if member_row is None else member_row + 1
+
+    skeleton = [label for label in labels if label[0] < rows]
+    template_id = summary_fingerprint(key, skeleton)
+    layout = None
+    if profit_cell is not None:
+        layout = {
+            'key': key,
+            'id': template_id,
+            'rows': rows,
+            'labels': skeleton,
+            'profit_cell': profit_cell,
+            'member_row': member_row
+        }
+    return profit, member_row, template_id, layout
+
+def read_sheet_financials(sheetnames, sheet_name, df, templates=SUMMARY_TEMPLATES):
+    """
+    Profit and (for a Summary sheet) per-student financials from a workbook
+    sheet, read at the learned cells when its layout is a known template.
+    Returns tuple: (profit, student_financials, template) where template is
+    {'id', 'sheet', 'profit_cell', 'layout'}: the layout's ID, the sheet read,
+    where the profit was read (e.g. "B3", None when it needed the search) and
+    the learnable layout (None if there is none). Results are the same as
+    calculate_profit_from_financial_file and student_financials_from_summary
+    give for the sheet, whichever way it was read.
+    """
+    cells = df.to_numpy(dtype=object)
+    key = summary_layout_key(sheetnames, sheet_name)
+    layout = templates.get(key)
+    known = _read_known_layout(cells, layout) if layout is not None else None
+
+    if known is not None:
+        profit, member_row = known
+        template_id = layout['id']
+    else:
+        profit, member_row, template_id, layout = _search_layout(cells, key)
+        if layout is not None:
+            templates.learn(layout)
+
+    students = None
+    if sheet_name == 'Summary':
+        students = {} if member_row is None else _student_financials_below(cells, member_row)
+
+    template = {
+        'id': template_id,
+        'sheet': sheet_name,
+        'profit_cell': cell_reference(*layout['profit_cell']) if layout is not None else None,
+        'layout': layout
+    }
+    return profit, students, template
+
+# Display Tables
+def build_workload_matrix(group_data, variance_scores, variance_threshold=VARIANCE_THRESHOLD_DEFAULT):
+    """
+    Build the Workload Distribution Matrix shown for a group.
+    Rows = students being evaluated, columns = evaluators, plus a Variance column.
+    Returns a DataFrame indexed from 1, or None if the group has no students.
+    """
+    # Create matrix showing who said what about whom
+    # This should be a square matrix: all students x all students
+    ratings = get_rating_matrix(group_data)
+    matrix_students = ratings['students']
+    if not matrix_students:
+        return None
+
+    # Get short names for all students
+    names = student_names(group_data)
+    student_shorts = [names[student].short for student in matrix_students]
+
+    # Calculate expected contribution and threshold for highlighting
+    num_students = len(matrix_students)
+    expected_pct = 100.0 / num_students
+    low_threshold = expected_pct * 0.6  # Same threshold as red flag detection
+
+    # Rows = students being evaluated, columns = evaluators; a submitter who
+    # left a teammate out counts as 0% for them
+    pcts = np.nan_to_num(ratings['values'].T, nan=0.0)
+    low = pcts < low_threshold
+    submitted = ratings['submitted']
+
+    matrix_data = []
+    for i, student_being_evaluated in enumerate(matrix_students):
+        row = {'Student': student_shorts[i]}
+
+        # For each potential evaluator (all students in group)
+        for j, evaluator_short in enumerate(student_shorts):
+            # Evaluator didn't submit
+            if not submitted[j]:
+                row[evaluator_short] = "-"
+                continue
+
+            # Highlight low percentages in red
+            pct_display = f"🔴 {pcts[i, j]}%" if low[i, j] else f"{pcts[i, j]}%"
+
+            # Mark self-evaluation with a star
+            row[evaluator_short] = f"{pct_display} ★" if i == j else pct_display
+
+        # Add variance (highlight if above threshold)
+        variance = variance_scores.get(student_being_evaluated, 0)
+        if variance > variance_threshold:
+            row['Variance'] = f"🔴 ±{variance:.1f}%"
+        else:
+            row['Variance'] = f"±{variance:.1f}%"
+
+        matrix_data.append(row)
+
+    matrix_df = pd.DataFrame(matrix_data)
+    # Set index to start at 1
+    matrix_df.index = range(1, len(matrix_df) + 1)
+    return matrix_df
+
+def build_student_financial_table(group_data, student_financials):
+    """
+    Build the Individual Student Financials table for a group, matching roster
+    names ("Last, First") to workbook names ("First Last").
+    Returns a DataFrame indexed from 1, or None if no student could be matched.
+    """
+    students = sorted(group_data['students'])
+    names = student_names(group_data)
+
+    fin_data = []
+    all_incomes = []
+
+    # First pass: collect all data
+    for student in students:
+        # Match "GroupID - Last, First" to the workbook's "First Last"
+        student_short = names[student].short
+        student_fin = match_student_financials(names[student], student_financials)
+
+        if student_fin:
+            all_incomes.append(student_fin['income'])
+            fin_data.append({
+                'student_short': student_short,
+                'income': student_fin['income'],
+                'expenses': student_fin['expenses'],
+                'profit': student_fin['profit'],
+                'inventory': student_fin['inventory']
+            })
+
+    # Calculate average income for highlighting
+    avg_income = sum(all_incomes) / len(all_incomes) if all_incomes else 0
+    low_sales_threshold = avg_income * 0.5
+
+    # Second pass: format with highlighting
+    formatted_data = []
+    for item in fin_data:
+        # Highlight low income
+        if item['income'] < low_sales_threshold and avg_income > 10:
+            income_display = f"🔴 ${item['income']:.2f}"
+        else:
+            income_display = f"${item['income']:.2f}"
+
+        # Highlight negative profit
+        if item['profit'] < 0:
+            profit_display = f"🔴 ${item['profit']:.2f}"
+        else:
+            profit_display = f"${item['profit']:.2f}"
+
+        formatted_data.append({
+            'Student': item['student_short'],
+            'Income': income_display,
+            'Expenses': f"${item['expenses']:.2f}",
+            'Profit': profit_display,
+            'Inventory Value': f"${item['inventory']:.2f}"
+        })
+
+    if not formatted_data:
+        return None
+
+    fin_df = pd.DataFrame(formatted_data)
+    # Set index to start at 1
+    fin_df.index = range(1, len(fin_df) + 1)
+    return fin_df
+
+# Batch Reports
+def build_flag_report(groups, group_financials, student_financials, roster=None, variance_threshold=VARIANCE_THRESHOLD_DEFAULT, matcher=None):
+    """
+    Analyze every group and collect the results as plain, JSON-friendly data.
+    Returns dict with:
+    - summary: class-wide counts
+    - periods: the same counts per period (see summarize_periods)
+    - groups: one entry per group (sorted by ID) with period, status, flags and profit
+    - missing_submissions: roster students who haven't submitted
+    """
+    group_reports = []
+    for group_id in sorted(groups.keys()):
+        group_data = groups[group_id]
+        financial_profit = group_financials.get(group_id, None)
+        is_red_flag, flags, variance_scores = analyze_group_flags(
+            group_data,
+            financial_profit,
+            variance_threshold,
+            student_financials.get(group_id, {}),
+            matcher
+        )
+        group_reports.append({
+            'group_id': group_id,
+            'period': group_period(group_id),
+            'status': 'RED FLAG' if is_red_flag else 'OK',
+            'is_red_flag': is_red_flag,
+            'flags': flags,
+            'max_variance': max(variance_scores.values()) if variance_scores else 0,
+            'profit': financial_profit,
+            'students': sorted(group_data['students']),
+            'submissions': len(group_data['evaluations'])
+        })
+
+    missing_students = get_missing_submissions(roster, groups)
+    missing = [
+        {key: student[key] for key in ('name', 'first_name', 'last_name', 'group', 'period')}
+        for student in missing_students
+    ]
+
+    if roster:
+        total_students = len(roster['students'])
+    else:
+        total_students = sum(len(g['students']) for g in groups.values())
+
+    summary = {
+        'variance_threshold': variance_threshold,
+        'total_groups': len(groups),
+        'total_students': total_students,
+        'total_submissions': sum(len(g['evaluations']) for g in groups.values()),
+        'groups_with_financials': sum(1 for gid in groups.keys() if gid in group_financials),
+        'red_flag_groups': sum(1 for g in group_reports if g['is_red_flag']),
+        'missing_submissions': len(missing)
+    }
+
+    red_flag_groups = {g['group_id'] for g in group_reports if g['is_red_flag']}
+
+    return {
+        'summary': summary,
+        'periods': summarize_periods(groups, group_financials, red_flag_groups, roster, missing_students),
+        'groups': group_reports,
+        'missing_submissions': missing
+    }
+
+# Multi-Section Batches
+def group_period(group_id):
+    """Class period of a group, from its ID's leading digits ('2A' -> 2), or None"""
+    match = re.match(r'^\s*(\d+)', str(group_id))
+    return int(match.group(1)) if match else None
+
+def _period_key(period):
+    """Sort key putting numbered periods first, in order"""
+    return (period is None, period if period is not None else 0)
+
+def groups_by_period(groups):
+    """Nested {period: {group_id: group_data}} view of a groups dict, periods in order"""
+    nested = {}
+    for group_id in sorted(groups):
+        nested.setdefault(group_period(group_id), {})[group_id] = groups[group_id]
+    return dict(sorted(nested.items(), key=lambda item: _period_key(item[0])))
+
+def _read_export_worker(filename, data):
+    """Process pool entry point: stream one peer review export from its raw bytes"""
+    return read_peer_review_csv(named_buffer(filename, data))
+
+def _map_in_pool(fn, arg_tuples, workers):
+    """fn(*args) for each args tuple, across a process pool when workers > 1; results in input order"""
+    if workers > 1 and len(arg_tuples) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(arg_tuples)), mp_context=process_pool_context()) as pool:
+            return list(pool.map(fn, *zip(*arg_tuples)))
+    return [fn(*args) for args in arg_tuples]
+
+def read_peer_review_exports(named_payloads, workers=1):
+    """
+    Read several exports (list of (filename, bytes)) and merge them into one
+    frame holding each student's latest submission, newest first; None when
+    every export is empty.
+    """
+    frames = [frame for frame in _map_in_pool(_read_export_worker, named_payloads, workers) if len(frame)]
+    if not frames:
+        return None
+    return latest_submissions(pd.concat(frames, ignore_index=True))
+
+def parse_peer_review_exports(named_payloads, workers=1):
+    """
+    Parse several peer review exports (e.g. one per period) into one class-wide
+    groups dict, the same shape parse_peer_review_data returns.
+    named_payloads is a list of (filename, bytes). With workers > 1 the exports
+    are read, and then the periods parsed, across a process pool. A student who
+    appears in more than one export keeps their most recent submission.
+    """
+    merged = read_peer_review_exports(named_payloads, workers)
+    if merged is None:
+        return {}
+
+    # Periods never share a group, so each one parses independently
+    periods = extract_group_ids(merged['YOU - Group Member 1']).map(group_period, na_action='ignore')
+    sections = [(section,) for _, section in merged.groupby(periods, sort=False, dropna=False)]
+
+    groups = {}
+    for section_groups in _map_in_pool(parse_peer_review_data, sections, workers):
+        groups.update(section_groups)
+    return groups
+
+def summarize_periods(groups, group_financials, red_flag_groups, roster=None, missing_submissions=()):
+    """
+    Class-wide metrics per period.
+    red_flag_groups is the set of flagged group IDs at the current threshold.
+    Returns list of dicts (period, groups, students, submissions, red_flag_groups,
+    groups_with_financials, total_profit, missing_submissions), ordered by period.
+    Students are counted from the roster when given, otherwise from submissions.
+    """
+    rows = {}
+
+    def row(period):
+        return rows.setdefault(period, {
+            'period': period,
+            'groups': 0,
+            'students': 0,
+            'submissions': 0,
+            'red_flag_groups': 0,
+            'groups_with_financials': 0,
+            'total_profit': 0.0,
+            'missing_submissions': 0
+        })
+
+    for period, period_groups in groups_by_period(groups).items():
+        entry = row(period)
+        for group_id, group_data in period_groups.items():
+            entry['groups'] += 1
+            entry['submissions'] += len(group_data['evaluations'])
+            entry['red_flag_groups'] += group_id in red_flag_groups
+            if not roster:
+                entry['students'] += len(group_data['students'])
+            if group_financials.get(group_id) is not None:
+                entry['groups_with_financials'] += 1
+                entry['total_profit'] += group_financials[group_id]
+
+    if roster:
+        for student in roster['students']:
+            row(group_period(student['group']))['students'] += 1
+    for student in missing_submissions:
+        row(group_period(student['group']))['missing_submissions'] += 1
+
+    return [rows[period] for period in sorted(rows, key=_period_key)]
+
+# Incremental Updates
+# Google Forms exports keep growing while grading is under way. Instead of
+# re-parsing a re-uploaded export, the rows newer than each student's
+# watermark (the Timestamp of the submission already processed) mark their
+# groups dirty, and only those groups are parsed and analyzed again.
+def submission_watermarks(groups):
+    """{submitter: Timestamp of the processed submission as int64 nanoseconds} for parsed groups"""
+    submitters = []
+    timestamps = []
+    for group_data in groups.values():
+        for eval in group_data['evaluations']:
+            submitters.append(eval['submitter'])
+            timestamps.append(eval['timestamp'])
+    keys = _timestamp_keys(pd.DataFrame({'Timestamp': pd.Series(timestamps, dtype=object)}))
+    return dict(zip(submitters, keys.tolist()))
+
+def merge_new_submissions(groups, watermarks, df, matcher=None):
+    """
+    Fold a re-uploaded export into groups parsed (and keyword-indexed) from an
+    earlier version of it.
+    df is the export, e.g. as read_peer_review_csv / read_peer_review_exports
+    return it. A row is new when its submitter has no watermark or a later Timestamp
+    (any other Timestamp, in fact: deleting a student's latest response brings
+    back an earlier one). The groups of new rows, and of students no longer in
+    the export, are dirty and re-parsed from all of their rows in df. Other
+    groups keep their objects.
+    Returns tuple: (groups, watermarks, dirty) - new dicts and the set of dirty group IDs.
+    """
+    # Only each student's latest row counts (a no-op after read_peer_review_csv)
+    df = latest_submissions(conform_to_schema(df))
+    submitters = _column(df, 'YOU - Group Member 1', None)
+    group_ids = extract_group_ids(submitters)
+    timestamps = _timestamp_keys(df)
+
+    names = submitters.to_numpy(dtype=object)
+    known = np.fromiter((name in watermarks for name in names), dtype=bool, count=len(names))
+    marks = np.fromiter((watermarks.get(name, 0) for name in names), dtype=np.int64, count=len(names))
+    new = (~known | (timestamps != marks)) & group_ids.notna().to_numpy()
+
+    dirty = set(group_ids[new])
+    present = set(names[group_ids.notna().to_numpy()])
+    dirty.update(extract_group_id(name) for name in watermarks if name not in present)
+    dirty.discard(None)
+    if not dirty:
+        return groups, watermarks, dirty
+
+    reparsed = parse_peer_review_data(df[group_ids.isin(dirty).to_numpy()])
+    index_keyword_hits(reparsed, matcher)
+
+    merged = {group_id: group_data for group_id, group_data in groups.items() if group_id not in dirty}
+    merged.update(reparsed)
+
+    updated = {name: mark for name, mark in watermarks.items() if extract_group_id(name) not in dirty}
+    updated.update(submission_watermarks(reparsed))
+    return merged, updated, dirty
+
+def update_group_bases(bases, groups, dirty, group_financials, student_financials, matcher=None):
+    """
+    analyze_group_base results for groups, re-running it only for the dirty
+    group IDs and reusing bases for the rest. Groups no longer present are dropped.
+    """
+    return {
+        group_id: (
+            bases[group_id] if group_id in bases and group_id not in dirty
+            else analyze_group_base(group_data, group_financials.get(group_id),
+                                    student_financials.get(group_id, {}), matcher)
+        )
+        for group_id, group_data in groups.items()
+    }
+
+# Instrumentation
+# tracemalloc is process-wide and the dashboard profiles several sessions at
+# once. Tracing is reference counted, so the last profiler to close stops it
+# (unless it was on before any profiler started it), and every open stage of
+# every profiler is registered here: before the traced peak is reset for a new
+# stage, the peak so far is folded into all of them, so none loses its peak.
+_TRACING_LOCK = threading.Lock()
+_tracing_users = 0
+_tracing_started = False
+_open_stages = {}
+
+def _acquire_tracing():
+    global _tracing_users, _tracing_started
+    with _TRACING_LOCK:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started = True
+        _tracing_users += 1
+
+def _release_tracing():
+    global _tracing_users, _tracing_started
+    with _TRACING_LOCK:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+
+def _fold_traced_peak():
+    """Raise every open stage's peak to the traced peak so far; returns the memory in use (lock held)"""
+    current, peak = tracemalloc.get_traced_memory()
+    for frame in _open_stages.values():
+        frame['peak'] = max(frame['peak'], peak)
+    return current
+
+def _open_traced_stage():
+    with _TRACING_LOCK:
+        current = _fold_traced_peak()
+        tracemalloc.reset_peak()
+        frame = {'base': current, 'peak': current}
+        _open_stages[id(frame)] = frame
+        return frame
+
+def _close_traced_stage(frame):
+    """Bytes the stage's peak rose above the memory in use when it opened"""
+    with _TRACING_LOCK:
+        _fold_traced_peak()
+        del _open_stages[id(frame)]
+        return frame['peak'] - frame['base']
+
+class StageProfiler:
+    """
+    Opt-in wall time, call count and tracemalloc peak per pipeline stage, plus
+    per-file timings reported by load_financial_data.
+    A disabled profiler records nothing, so callers can wrap stages unconditionally.
+    Stages may nest, and may overlap other profilers' stages; a stage's peak is
+    measured above the memory in use when it started, and (memory being
+    process-wide) includes whatever overlapping stages allocated meanwhile.
+    """
+
+    def __init__(self, enabled=True, trace_memory=True):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.stages = {}
+        self.files = []
+        self._tracing = False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        if self.trace_memory and not self._tracing:
+            _acquire_tracing()
+            self._tracing = True
+
+        frame = _open_traced_stage() if self._tracing else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak_bytes = _close_traced_stage(frame) if frame is not None else 0
+            self.record(name, seconds, peak_bytes)
+
+    def record(self, name, seconds, peak_bytes=0):
+        """Add one call of a stage timed elsewhere"""
+        if not self.enabled:
+            return
+        entry = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'peak_bytes': 0})
+        entry['calls'] += 1
+        entry['seconds'] += seconds
+        entry['peak_bytes'] = max(entry['peak_bytes'], peak_bytes)
+
+    def record_file(self, filename, seconds, source):
+        """Add one financial file's load time; source is 'decoded', 'worker', 'cache' or 'error'"""
+        if self.enabled:
+            self.files.append({'filename': filename, 'seconds': seconds, 'source': source})
+
+    def records(self):
+        """Stage and file timings as flat dicts, stages first in the order they first ran"""
+        rows = [
+            {
+                'kind': 'stage',
+                'stage': name,
+                'calls': entry['calls'],
+                'seconds': round(entry['seconds'], 6),
+                'peak_mb': round(entry['peak_bytes'] / (1024 * 1024), 3)
+            }
+            for name, entry in self.stages.items()
+        ]
+        rows.extend(
+            {'kind': 'file', 'file': f['filename'], 'seconds': round(f['seconds'], 6), 'source': f['source']}
+            for f in self.files
+        )
+        return rows
+
+    def log(self, log=None):
+        """Emit one logfmt line per record, e.g. 'perf kind=stage stage="parse" calls=1 ...'"""
+        log = log or logger
+        for record in self.records():
+            log.info("perf %s", " ".join(
+                f"{key}={json.dumps(value) if isinstance(value, str) else value}" for key, value in record.items()
+            ))
+
+    def close(self):
+        """Release tracemalloc; tracing stops when the last profiler using it closes"""
+        if self._tracing:
+            self._tracing = False
+            _release_tracing()
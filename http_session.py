@@ -0,0 +1,16 @@
+"""
+Shared HTTP session setup for the Bazaar Peer Review Grader.
+
+Kept to requests alone, so link_check.py can use it without pulling in
+Pillow or grader_core.
+"""
+import requests
+from requests.adapters import HTTPAdapter
+
+def pooled_session(pool_size):
+    """requests session keeping up to pool_size keep-alive connections per host"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
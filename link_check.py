@@ -0,0 +1,143 @@
+"""
+Evidence link checker for the Bazaar Peer Review Grader.
+
+Checks every evidence and photo link of a class at once, so a dead or
+unshared Drive link shows up before the teacher clicks it. An asyncio loop
+fans HEAD requests out over one pooled requests session, capped overall and
+per host, and results are reused for RESULT_TTL_SECONDS.
+"""
+import asyncio
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from http_session import pooled_session
+
+logger = logging.getLogger(__name__)
+
+# Link statuses
+LINK_OK = 'ok'
+LINK_RESTRICTED = 'restricted'    # needs a sign-in or isn't shared with the teacher
+LINK_BROKEN = 'broken'            # the server answered with an error (e.g. 404)
+LINK_UNREACHABLE = 'unreachable'  # timed out or the connection failed
+LINK_INVALID = 'invalid'          # not an http(s) URL
+
+# Requests in flight overall and per host (nearly every link is on drive.google.com)
+MAX_CONCURRENCY = 32
+PER_HOST_CONCURRENCY = 16
+CHECK_TIMEOUT_SECONDS = 8
+
+# How long a result is reused before the link is checked again
+RESULT_TTL_SECONDS = 15 * 60
+
+# Results kept at most; expired ones are dropped whenever new results come in
+RESULT_MAX_ENTRIES = 20000
+
+# Redirects here mean the file isn't visible without signing in
+SIGN_IN_HOSTS = ('accounts.google.com',)
+
+def classify_response(status_code, final_url):
+    """(status, detail) for the last response of a request"""
+    if urlsplit(final_url).hostname in SIGN_IN_HOSTS:
+        return LINK_RESTRICTED, "sign-in required"
+    if status_code in (401, 403):
+        return LINK_RESTRICTED, f"HTTP {status_code}"
+    if status_code < 400:
+        return LINK_OK, f"HTTP {status_code}"
+    return LINK_BROKEN, f"HTTP {status_code}"
+
+class LinkChecker:
+    """
+    Checks URLs concurrently and remembers each result for ttl seconds.
+    check(urls) returns {url: {'status', 'detail', 'checked_at'}}; cached()
+    looks results up without making any requests.
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, per_host=PER_HOST_CONCURRENCY,
+                 timeout=CHECK_TIMEOUT_SECONDS, ttl=RESULT_TTL_SECONDS, max_entries=RESULT_MAX_ENTRIES,
+                 session=None):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._session = session or pooled_session(per_host)
+        self._executor = ThreadPoolExecutor(max_concurrency, thread_name_prefix='link-check')
+        self._lock = threading.Lock()
+        self._results = {}
+
+    def cached(self, urls):
+        """Unexpired results for any of urls that have been checked"""
+        now = time.time()
+        with self._lock:
+            return {
+                url: self._results[url] for url in urls
+                if url in self._results and now - self._results[url]['checked_at'] < self.ttl
+            }
+
+    def _request(self, url):
+        response = self._session.head(url, allow_redirects=True, timeout=self.timeout)
+        if response.status_code in (405, 501):
+            # Some servers refuse HEAD; a streamed GET stops after the headers
+            with self._session.get(url, allow_redirects=True, timeout=self.timeout, stream=True) as response:
+                return classify_response(response.status_code, response.url)
+        return classify_response(response.status_code, response.url)
+
+    async def _check_one(self, url, host_limits):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            return LINK_INVALID, "not a web link"
+        loop = asyncio.get_running_loop()
+        async with host_limits[parts.hostname]:
+            try:
+                # Redirect chains can outlast the per-request timeout, so cap the whole check too
+                return await asyncio.wait_for(
+                    loop.run_in_executor(self._executor, self._request, url), 2 * self.timeout
+                )
+            except (asyncio.TimeoutError, requests.Timeout):
+                return LINK_UNREACHABLE, "timed out"
+            except requests.RequestException as e:
+                return LINK_UNREACHABLE, type(e).__name__
+
+    async def check_async(self, urls):
+        """Check every URL without a fresh result, concurrently; returns results for all of urls"""
+        urls = list(dict.fromkeys(urls))
+        results = self.cached(urls)
+        pending = [url for url in urls if url not in results]
+        if pending:
+            start = time.perf_counter()
+            host_limits = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+            outcomes = await asyncio.gather(*(self._check_one(url, host_limits) for url in pending))
+            checked_at = time.time()
+            with self._lock:
+                for url, (status, detail) in zip(pending, outcomes):
+                    # Re-inserted, so the dict stays in check order for pruning
+                    self._results.pop(url, None)
+                    self._results[url] = {'status': status, 'detail': detail, 'checked_at': checked_at}
+                    results[url] = self._results[url]
+                self._prune(checked_at)
+            logger.info("Checked %d links in %.2fs", len(pending), time.perf_counter() - start)
+        return results
+
+    def _prune(self, now):
+        """Drop expired results, then the oldest past max_entries (caller holds the lock)"""
+        for url in list(self._results):
+            if now - self._results[url]['checked_at'] < self.ttl and len(self._results) <= self.max_entries:
+                break
+            del self._results[url]
+
+    def check(self, urls):
+        """Blocking wrapper around check_async for callers without an event loop"""
+        return asyncio.run(self.check_async(urls))
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._session.close()
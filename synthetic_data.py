@@ -0,0 +1,332 @@
+"""
+Synthetic class data for the Bazaar Peer Review Grader.
+
+Generates a student roster, a Google Forms peer review export and one
+"{GroupID}-Income and Expense Tracking.xlsx" workbook per group at any size,
+for load testing and benchmarks (see benchmark.py). The data mimics the real
+exports: 3 and 4 member groups, students who resubmit, students who never
+submit, malformed percentages and the usual red flag vocabulary.
+
+    python synthetic_data.py out_dir --submissions 10000 --workbooks 500
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import string
+from datetime import datetime, timedelta
+
+import openpyxl
+
+from grader_core import (
+    CONSENT_COLUMNS,
+    EVIDENCE_COL,
+    FEEDBACK_COLUMNS,
+    FORM_COLUMNS,
+    HAS_MEMBER4_COL,
+    MEMBER_SLOTS,
+    PHOTO_COL,
+    WORK_TYPES,
+)
+
+FIRST_NAMES = [
+    'Alex', 'BriAri', 'Brayden', 'Chiebuka', 'Evan', 'Jaz', 'Joey', 'Kris', 'Ritchie', 'Theo',
+    'Vernon', 'Maya', 'Sofia', 'Liam', 'Noah', 'Ava', 'Mateo', 'Zoe', 'Aiden', 'Priya',
+    'Jamal', 'Lucia', 'Hana', 'Omar', 'Grace', 'Diego', 'Nia', 'Ethan', 'Layla', 'Kai'
+]
+LAST_NAMES = [
+    'Watts', 'Nwaezeigwe', 'Cole', 'Gonzalez-Valdez', 'Deakins', 'Klein', 'Chen', 'Lopez', 'Dang',
+    'Nelson', 'Diaz', 'Patel', 'Nguyen', 'Kim', 'Okafor', 'Rossi', 'Silva', 'Haddad', 'Murphy',
+    'Schmidt', 'Tanaka', 'Moreau', 'Ivanova', 'Osei', 'Johnson', "O'Brien", 'Garcia', 'Singh'
+]
+PERIODS = [2, 5, 6, 7, 8]
+
+WORK_PHRASES = {
+    'design': ['Created initial concept sketches', 'Made the CAD drawings', 'Picked the color scheme',
+               'Helped brainstorm ideas', 'Designed the logo in Illustrator'],
+    'manufacturing': ['Ran the laser cutter', 'Assembled the main components', 'Did finishing and sanding',
+                      'Manufactured the advanced items', 'Did quality control'],
+    'sales': ['Ran the register at the bazaar', 'Tracked the budget', 'Managed the booth schedule',
+              'Kept the financial records', 'Set prices'],
+    'marketing': ['Made Instagram posts', 'Designed flyers', 'Set up the booth display',
+                  'Took product photos', 'Made the price signs']
+}
+RED_FLAG_PHRASES = ['was absent most days', 'never showed up to work sessions', "didn't help with anything",
+                    'was lazy about deadlines', 'did nothing', 'was always late', 'refused to help', 'was rude to us']
+CHALLENGES = ['Time management was hard at first', 'We disagreed on the design', 'The laser cutter was always busy',
+              'Scheduling meetings was tough', 'We ran out of materials']
+GOOD_STUFF = ['Everyone communicated well', 'We sold out of our best item', 'Our booth looked great',
+              'We learned a lot about pricing', 'The team worked hard']
+ADVICE = ['Start early and communicate often', 'Make a group chat on day one', 'Test your designs before cutting',
+          'Track every expense', 'Split the work evenly']
+
+def _group_label(index):
+    """0 -> 'A', 25 -> 'Z', 26 -> 'AA', ... (bijective base 26)"""
+    label = ''
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        label = string.ascii_uppercase[rem] + label
+    return label
+
+def generate_groups(num_groups, rng, four_member_rate=0.5):
+    """
+    Generate groups of 3 or 4 students spread across PERIODS.
+    Returns list of dicts with group_id, period, members [(first, last)] and
+    true_shares (each member's actual share of the work, summing to 100).
+    """
+    groups = []
+    used_names = set()
+    for i in range(num_groups):
+        period = PERIODS[i % len(PERIODS)]
+        group_id = f"{period}{_group_label(i // len(PERIODS))}"
+        size = 4 if rng.random() < four_member_rate else 3
+
+        members = []
+        while len(members) < size:
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            # Keep names unique within a group so workbook matching is unambiguous
+            if (group_id, first, last) in used_names:
+                first = f"{first}{rng.randint(2, 99)}"
+            used_names.add((group_id, first, last))
+            members.append((first, last))
+
+        # Mostly fair groups, with the occasional slacker
+        weights = [rng.uniform(0.8, 1.2) for _ in members]
+        if rng.random() < 0.2:
+            weights[rng.randrange(size)] *= rng.uniform(0.1, 0.4)
+        total = sum(weights)
+        true_shares = [100.0 * w / total for w in weights]
+
+        groups.append({
+            'group_id': group_id,
+            'period': period,
+            'members': members,
+            'true_shares': true_shares
+        })
+    return groups
+
+def csv_name(group_id, member):
+    """Student name as it appears in the peer review form: 'GroupID - Last, First'"""
+    first, last = member
+    return f"{group_id} - {last}, {first}"
+
+def workbook_name(member):
+    """Student name as it appears in the financial workbook: 'First Last'"""
+    first, last = member
+    return f"{first} {last}"
+
+def _whole_percentages(shares):
+    """Round shares to whole numbers that still sum to 100 (largest remainder)"""
+    floors = [int(share) for share in shares]
+    by_remainder = sorted(range(len(shares)), key=lambda i: shares[i] - floors[i], reverse=True)
+    for i in by_remainder[:100 - sum(floors)]:
+        floors[i] += 1
+    return floors
+
+def _format_percentage(value, rng, malformed_rate):
+    """Format a percentage the way students type it, occasionally malformed"""
+    if rng.random() >= malformed_rate:
+        return value
+    return rng.choice([
+        f"{value}%",
+        f" {value} ",
+        f"{value + rng.choice([-5, 5])}",
+        f"about {value}",
+        '',
+        'N/A'
+    ])
+
+def _description(work_type, rng, red_flag_rate):
+    if rng.random() < 0.1:
+        return ''
+    text = rng.choice(WORK_PHRASES[work_type])
+    if rng.random() < red_flag_rate:
+        text = f"{text}, but {rng.choice(RED_FLAG_PHRASES)}"
+    return text
+
+def _drive_urls(rng, max_urls=3):
+    ids = [''.join(rng.choices(string.ascii_letters + string.digits + '_-', k=33)) for _ in range(rng.randint(0, max_urls))]
+    return ', '.join(f"https://drive.google.com/open?id={file_id}" for file_id in ids)
+
+def submission_row(group, submitter_idx, timestamp, rng, malformed_rate=0.03, red_flag_rate=0.05):
+    """One Google Forms response from a group member, as {column: value}"""
+    members = group['members']
+    group_id = group['group_id']
+    order = [submitter_idx] + rng.sample([i for i in range(len(members)) if i != submitter_idx], len(members) - 1)
+
+    # Each student's view of the split is the true split plus some bias toward themselves
+    views = [max(group['true_shares'][i] + rng.gauss(0, 3), 0) for i in order]
+    views[0] += rng.uniform(0, 5)
+    scale = 100.0 / sum(views)
+    views = _whole_percentages([v * scale for v in views])
+
+    first, last = members[submitter_idx]
+    row = {column: '' for column in FORM_COLUMNS}
+    row['Timestamp'] = timestamp.strftime('%m/%d/%Y %H:%M:%S')
+    row['Email Address'] = f"{first.lower()}.{last.lower()}@student.edu".replace("'", '')
+
+    for slot, member_idx, share in zip(MEMBER_SLOTS, order, views):
+        row[slot['name']] = csv_name(group_id, members[member_idx])
+        row[slot['percentage']] = _format_percentage(share, rng, malformed_rate)
+        for work_type in WORK_TYPES:
+            # ~16 descriptions per response, so keep per-description red flags rarer
+            row[slot[work_type]] = _description(work_type, rng, red_flag_rate / 10)
+
+    if len(members) == 4:
+        row[HAS_MEMBER4_COL] = 'Yes'
+    else:
+        row[HAS_MEMBER4_COL] = 'No'
+        row[MEMBER_SLOTS[3]['percentage']] = 0
+
+    row[EVIDENCE_COL] = _drive_urls(rng)
+    row[PHOTO_COL] = _drive_urls(rng, max_urls=4)
+    row[FEEDBACK_COLUMNS['challenges']] = rng.choice(CHALLENGES)
+    row[FEEDBACK_COLUMNS['good_stuff']] = rng.choice(GOOD_STUFF)
+    row[FEEDBACK_COLUMNS['advice']] = rng.choice(ADVICE)
+    if rng.random() < red_flag_rate:
+        other = members[rng.choice(order[1:])][0]
+        row[FEEDBACK_COLUMNS['challenges']] += f". {other} {rng.choice(RED_FLAG_PHRASES)}."
+    for column in CONSENT_COLUMNS:
+        row[column] = 'Yes'
+    return row
+
+def generate_submissions(groups, num_submissions, rng, submit_rate=0.9, duplicate_rate=0.05,
+                         malformed_rate=0.03, red_flag_rate=0.05, start=None):
+    """
+    Generate up to num_submissions form responses across groups (cycling through
+    them again if needed). Some students don't submit; some submit twice.
+    """
+    start = start or datetime(2025, 12, 10, 8, 0, 0)
+    rows = []
+    while len(rows) < num_submissions:
+        added = 0
+        for group in groups:
+            for member_idx in range(len(group['members'])):
+                if rng.random() >= submit_rate:
+                    continue
+                submissions = 2 if rng.random() < duplicate_rate else 1
+                for _ in range(submissions):
+                    timestamp = start + timedelta(seconds=rng.randint(0, 7 * 24 * 3600))
+                    rows.append(submission_row(group, member_idx, timestamp, rng, malformed_rate, red_flag_rate))
+                    added += 1
+                    if len(rows) >= num_submissions:
+                        return rows
+        if not added:
+            break
+    return rows
+
+def write_peer_review_csv(rows, output):
+    """Write form responses as a Google Forms CSV export"""
+    writer = csv.DictWriter(output, fieldnames=FORM_COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+
+def write_roster_csv(groups, output):
+    """Write the roster CSV (Period, Group, Student First Name, Student Last Name)"""
+    writer = csv.writer(output)
+    writer.writerow(['Period', 'Group', 'Student First Name', 'Student Last Name'])
+    for group in groups:
+        for first, last in group['members']:
+            writer.writerow([group['period'], group['group_id'], first, last])
+
+def workbook_bytes(group, rng, log_rows=40, currency_text_rate=0.1):
+    """
+    Build an Income and Expense Tracking workbook for a group, laid out like the
+    class template: totals at the top of the Summary sheet, a "Group Member"
+    header row and one row per student, plus a Sales Log sheet.
+    """
+    students = []
+    for member, share in zip(group['members'], group['true_shares']):
+        income = round(max(rng.gauss(share * 5, 25), 0))
+        expenses = round(max(rng.gauss(60, 20), 0))
+        inventory = round(max(rng.gauss(50, 15), 0))
+        students.append((workbook_name(member), income, expenses, income - expenses, inventory))
+
+    total_income = sum(s[1] for s in students)
+    total_expenses = sum(s[2] for s in students)
+    total_inventory = sum(s[4] for s in students)
+
+    def money(value):
+        # Some students type currency as text
+        return f"${value:,.2f}" if rng.random() < currency_text_rate else value
+
+    workbook = openpyxl.Workbook(write_only=True)
+    summary = workbook.create_sheet('Summary')
+    summary.append(['Total Income', total_income, None, 'Inventory Value', total_inventory])
+    summary.append(['Total Expenses', total_expenses, None, 'Secret Code', ''.join(rng.choices(string.ascii_uppercase, k=3))])
+    summary.append(['Total Profit', total_income - total_expenses])
+    summary.append([])
+    summary.append([])
+    summary.append(['Group Member', 'Total Income', 'Total Expenses', 'Net Profit', 'Inventory Value (if all sold)'])
+    for name, income, expenses, profit, inventory in students:
+        summary.append([name, money(income), money(expenses), money(profit), money(inventory)])
+
+    log = workbook.create_sheet('Sales Log')
+    log.append(['Date', 'Student', 'Item', 'Quantity', 'Price', 'Total'])
+    for _ in range(log_rows):
+        quantity = rng.randint(1, 4)
+        price = rng.choice([2, 3, 5, 8, 10, 15])
+        log.append([f"12/{rng.randint(1, 19)}/2025", rng.choice(students)[0], rng.choice(['Keychain', 'Coaster', 'Sign', 'Ornament']),
+                    quantity, price, quantity * price])
+
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+def workbook_filename(group):
+    return f"{group['group_id']}-Income and Expense Tracking.xlsx"
+
+def generate_dataset(out_dir, num_submissions=10000, num_workbooks=500, seed=0, **options):
+    """
+    Write roster.csv, peer_review.csv and workbooks/ into out_dir.
+    Enough groups are generated to cover both num_submissions and num_workbooks.
+    Returns dict with paths and counts.
+    """
+    rng = random.Random(seed)
+
+    # ~3.5 members per group, ~90% submit, a few duplicates
+    num_groups = max(num_workbooks, -(-num_submissions // 3) + 1)
+    groups = generate_groups(num_groups, rng)
+    rows = generate_submissions(groups, num_submissions, rng, **options)
+
+    os.makedirs(out_dir, exist_ok=True)
+    workbook_dir = os.path.join(out_dir, 'workbooks')
+    os.makedirs(workbook_dir, exist_ok=True)
+
+    roster_path = os.path.join(out_dir, 'roster.csv')
+    with open(roster_path, 'w', newline='') as f:
+        write_roster_csv(groups, f)
+
+    peer_review_path = os.path.join(out_dir, 'peer_review.csv')
+    with open(peer_review_path, 'w', newline='') as f:
+        write_peer_review_csv(rows, f)
+
+    for group in groups[:num_workbooks]:
+        with open(os.path.join(workbook_dir, workbook_filename(group)), 'wb') as f:
+            f.write(workbook_bytes(group, rng))
+
+    return {
+        'roster': roster_path,
+        'peer_review': peer_review_path,
+        'workbooks': workbook_dir,
+        'groups': len(groups),
+        'submissions': len(rows),
+        'workbook_count': min(num_workbooks, len(groups))
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic class (roster, peer review export, workbooks).")
+    parser.add_argument('out_dir', help="Directory to write roster.csv, peer_review.csv and workbooks/ into")
+    parser.add_argument('--submissions', type=int, default=10000, help="Number of form responses (default 10000)")
+    parser.add_argument('--workbooks', type=int, default=500, help="Number of financial workbooks (default 500)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default 0)")
+    args = parser.parse_args(argv)
+
+    info = generate_dataset(args.out_dir, args.submissions, args.workbooks, args.seed)
+    print(f"Wrote {info['submissions']} submissions for {info['groups']} groups and "
+          f"{info['workbook_count']} workbooks to {args.out_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Shared fixtures for the Bazaar Peer Review Grader tests.
+
+The modules live at the repository root, so it goes on sys.path here. Network
+tests run against a local http.server standing in for Google Drive.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import socket
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves the server's routes: {path: (status, content type, body)}"""
+
+    def _respond(self, send_body):
+        status, content_type, body = self.server.routes.get(self.path, (404, 'text/plain', b'not found'))
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond(True)
+
+    def do_HEAD(self):
+        self._respond(False)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub_server():
+    """Local HTTP server; set server.routes, build URLs with server.url(path)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.routes = {}
+    server.url = lambda path: f"http://127.0.0.1:{server.server_port}{path}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def closed_port_url():
+    """URL on a local port nothing listens on"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/photo.jpg"
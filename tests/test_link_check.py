@@ -0,0 +1,61 @@
+from link_check import (
+    LINK_BROKEN,
+    LINK_INVALID,
+    LINK_OK,
+    LINK_RESTRICTED,
+    LINK_UNREACHABLE,
+    LinkChecker,
+    classify_response,
+)
+
+def test_check_classifies_links(stub_server, closed_port_url):
+    stub_server.routes = {
+        '/evidence': (200, 'text/html', b'<p>evidence</p>'),
+        '/private': (403, 'text/plain', b'forbidden'),
+    }
+    urls = {
+        'ok': stub_server.url('/evidence'),
+        'restricted': stub_server.url('/private'),
+        'broken': stub_server.url('/gone'),
+        'invalid': 'drive.google.com/file/d/abc',
+        'unreachable': closed_port_url,
+    }
+    checker = LinkChecker(timeout=2)
+    try:
+        results = checker.check(urls.values())
+    finally:
+        checker.close()
+
+    assert results[urls['ok']]['status'] == LINK_OK
+    assert results[urls['restricted']]['status'] == LINK_RESTRICTED
+    assert results[urls['broken']]['status'] == LINK_BROKEN
+    assert results[urls['broken']]['detail'] == "HTTP 404"
+    assert results[urls['invalid']]['status'] == LINK_INVALID
+    assert results[urls['unreachable']]['status'] == LINK_UNREACHABLE
+
+def test_sign_in_redirect_is_restricted():
+    assert classify_response(200, 'https://accounts.google.com/ServiceLogin?continue=x')[0] == LINK_RESTRICTED
+
+def test_results_are_reused_and_expire(stub_server):
+    stub_server.routes = {'/evidence': (200, 'text/html', b'ok')}
+    url = stub_server.url('/evidence')
+    checker = LinkChecker(timeout=2, ttl=60)
+    try:
+        first = checker.check([url])[url]
+        stub_server.routes = {}
+        assert checker.check([url])[url] == first
+
+        # Expired results are pruned once new results come in
+        checker.ttl = 0
+        checker.check([stub_server.url('/other')])
+        assert url not in checker._results
+    finally:
+        checker.close()
+
+def test_results_are_bounded(stub_server):
+    checker = LinkChecker(timeout=2, max_entries=3)
+    try:
+        checker.check([stub_server.url(f'/{i}') for i in range(5)])
+        assert len(checker._results) == 3
+    finally:
+        checker.close()
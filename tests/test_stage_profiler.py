@@ -0,0 +1,46 @@
+import tracemalloc
+
+from grader_core import StageProfiler
+
+MB = 1024 * 1024
+
+def peak_mb(profiler, stage):
+    return next(r['peak_mb'] for r in profiler.records() if r.get('stage') == stage)
+
+def test_overlapping_profilers_keep_tracing_and_peaks():
+    first = StageProfiler()
+    second = StageProfiler()
+
+    first_stage = first.stage('parse')
+    first_stage.__enter__()
+    blob = bytearray(20 * MB)
+    del blob
+
+    # Another session's stage inside it must not wipe the first stage's peak
+    with second.stage('analyze'):
+        blob = bytearray(5 * MB)
+        del blob
+    first_stage.__exit__(None, None, None)
+
+    # The first session finishing must not stop tracing under the second
+    second_stage = second.stage('display')
+    second_stage.__enter__()
+    first.close()
+    assert tracemalloc.is_tracing()
+    blob = bytearray(20 * MB)
+    del blob
+    second_stage.__exit__(None, None, None)
+    second.close()
+
+    assert not tracemalloc.is_tracing()
+    assert peak_mb(first, 'parse') >= 20
+    assert peak_mb(second, 'analyze') >= 5
+    assert peak_mb(second, 'display') >= 20
+
+def test_disabled_profiler_leaves_tracing_alone():
+    profiler = StageProfiler(enabled=False)
+    with profiler.stage('parse'):
+        pass
+    profiler.close()
+    assert not tracemalloc.is_tracing()
+    assert profiler.records() == []
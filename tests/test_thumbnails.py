@@ -0,0 +1,32 @@
+from io import BytesIO
+
+from PIL import Image
+
+from grader_core import ContentCache
+from thumbnails import THUMBNAIL_WIDTH, ThumbnailService
+
+def png_bytes(width, height):
+    output = BytesIO()
+    Image.new('RGB', (width, height), 'orange').save(output, format='PNG')
+    return output.getvalue()
+
+def test_get_many_serves_images_and_skips_failures(stub_server):
+    stub_server.routes = {
+        '/photo.png': (200, 'image/png', png_bytes(1200, 900)),
+        '/sign-in': (200, 'text/html', b'<html>Sign in</html>'),
+    }
+    photo, page, missing = (stub_server.url(path) for path in ('/photo.png', '/sign-in', '/gone.jpg'))
+    service = ThumbnailService(ContentCache(16), thumbnail_url=lambda url: url, timeout=2)
+    try:
+        thumbnails = service.get_many([photo, page, missing])
+
+        with Image.open(BytesIO(thumbnails[photo])) as image:
+            assert image.size == (THUMBNAIL_WIDTH, 300)
+        assert thumbnails[page] is None
+        assert thumbnails[missing] is None
+
+        # The photo now comes from the cache, and failures aren't retried yet
+        stub_server.routes = {}
+        assert service.get_many([photo, missing]) == {photo: thumbnails[photo], missing: None}
+    finally:
+        service.close()
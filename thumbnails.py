@@ -0,0 +1,170 @@
+"""
+Photo thumbnail service for the Bazaar Peer Review Grader.
+
+Fetches each Google Drive photo once on the server, shrinks it and keeps it
+in a bounded cache, so browsers don't each pull every photo from Drive again.
+Fetches share one pooled HTTP session; the next groups' photos can be
+prefetched in the background.
+"""
+from concurrent.futures import ThreadPoolExecutor, wait
+from io import BytesIO
+import logging
+import threading
+import time
+
+import requests
+from PIL import Image, ImageOps
+
+from grader_core import convert_gdrive_to_thumbnail
+from http_session import pooled_session
+
+logger = logging.getLogger(__name__)
+
+# Stored thumbnails are at most this many pixels wide (matches Drive's sz=w400)
+THUMBNAIL_WIDTH = 400
+THUMBNAIL_MAX_HEIGHT = 3 * THUMBNAIL_WIDTH
+JPEG_QUALITY = 80
+
+# DiskCache file and version tag for stored thumbnails; bump the version when
+# the stored format changes
+CACHE_FILENAME = 'thumbnails.sqlite3'
+CACHE_VERSION = f'thumbnails-{THUMBNAIL_WIDTH}-1'
+
+# Concurrent fetches for the group being viewed, and for background prefetching
+FETCH_WORKERS = 8
+PREFETCH_WORKERS = 2
+FETCH_TIMEOUT_SECONDS = 10
+
+# Downloads larger than this are not thumbnailed
+MAX_DOWNLOAD_BYTES = 20 * 1024 * 1024
+
+# A photo that failed (missing, not shared, not an image) is not retried until this passes
+FAILURE_RETRY_SECONDS = 300
+
+def resize_image(data, width=THUMBNAIL_WIDTH, max_height=THUMBNAIL_MAX_HEIGHT):
+    """
+    Shrink image bytes to fit width x max_height, keeping the aspect ratio and
+    camera orientation. Returns JPEG bytes, or PNG where the image has transparency.
+    """
+    with Image.open(BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((width, max_height))
+        output = BytesIO()
+        if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+            image.save(output, format='PNG', optimize=True)
+        else:
+            image.convert('RGB').save(output, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+        return output.getvalue()
+
+class ThumbnailService:
+    """
+    Fetches, resizes and caches photo thumbnails.
+    cache is any get/put store (ContentCache, DiskCache or both); thumbnail_url
+    maps a photo link to the URL actually downloaded (Drive's thumbnail endpoint
+    by default). Each URL is fetched at most once at a time, and failures are
+    remembered for FAILURE_RETRY_SECONDS so a dead link isn't hammered.
+    """
+
+    def __init__(self, cache, workers=FETCH_WORKERS, prefetch_workers=PREFETCH_WORKERS,
+                 timeout=FETCH_TIMEOUT_SECONDS, width=THUMBNAIL_WIDTH,
+                 thumbnail_url=convert_gdrive_to_thumbnail, session=None):
+        self.cache = cache
+        self.timeout = timeout
+        self.width = width
+        self.thumbnail_url = thumbnail_url
+        self._session = session or pooled_session(workers + prefetch_workers)
+        # Prefetching gets its own pool so it never queues ahead of the group on screen
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='thumbnail')
+        self._prefetcher = ThreadPoolExecutor(prefetch_workers, thread_name_prefix='thumbnail-prefetch')
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._failed = {}
+
+    def _key(self, url):
+        return ('thumbnail', url, self.width)
+
+    def cached(self, url):
+        """Cached thumbnail bytes for url, or None"""
+        return self.cache.get(self._key(url))
+
+    def _download(self, url):
+        with self._session.get(self.thumbnail_url(url), timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '')
+            if not content_type.startswith('image/'):
+                # Drive answers a photo that isn't shared with a 200 sign-in page
+                raise ValueError(f"not an image ({content_type or 'no content type'})")
+            data = response.raw.read(MAX_DOWNLOAD_BYTES + 1, decode_content=True)
+            if len(data) > MAX_DOWNLOAD_BYTES:
+                raise ValueError("image too large")
+            return data
+
+    def _fetch(self, url):
+        try:
+            data = resize_image(self._download(url), self.width)
+        except (requests.RequestException, OSError, ValueError, Image.DecompressionBombError) as e:
+            logger.info("Thumbnail unavailable for %s: %s", url, e)
+            with self._lock:
+                self._failed[url] = time.monotonic()
+                self._pending.pop(url, None)
+            return None
+        self.cache.put(self._key(url), data)
+        with self._lock:
+            self._failed.pop(url, None)
+            self._pending.pop(url, None)
+        return data
+
+    def _submit(self, url, executor):
+        """Future for url's thumbnail, joining a fetch already under way; None if it failed recently"""
+        with self._lock:
+            future = self._pending.get(url)
+            # A prefetch still waiting in the queue moves to the foreground pool
+            if future is not None and not (executor is self._executor and future.cancel()):
+                return future
+            failed_at = self._failed.get(url)
+            if failed_at is not None and time.monotonic() - failed_at < FAILURE_RETRY_SECONDS:
+                return None
+            future = executor.submit(self._fetch, url)
+            self._pending[url] = future
+            return future
+
+    def get_many(self, urls, timeout=None):
+        """
+        Thumbnail bytes for each URL ({url: bytes or None}), fetching cache
+        misses concurrently. Waits at most timeout seconds (default twice the
+        request timeout); anything still downloading then comes back as None
+        and lands in the cache for the next rerun.
+        """
+        results = {}
+        futures = {}
+        for url in dict.fromkeys(urls):
+            data = self.cached(url)
+            if data is not None:
+                results[url] = data
+                continue
+            future = self._submit(url, self._executor)
+            if future is None:
+                results[url] = None
+            else:
+                futures[url] = future
+
+        if futures:
+            wait(futures.values(), timeout=2 * self.timeout if timeout is None else timeout)
+        for url, future in futures.items():
+            results[url] = future.result() if future.done() and not future.cancelled() else None
+        return results
+
+    def prefetch(self, urls):
+        """Queue background fetches for thumbnails not cached yet; returns how many were queued"""
+        queued = 0
+        for url in dict.fromkeys(urls):
+            if url in self._pending or self.cached(url) is not None:
+                continue
+            if self._submit(url, self._prefetcher) is not None:
+                queued += 1
+        return queued
+
+    def close(self):
+        self._prefetcher.shutdown(wait=False, cancel_futures=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._session.close()